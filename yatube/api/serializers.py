@@ -0,0 +1,48 @@
+"""Компактные словари для JSON: только поля, нужные клиентам."""
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created,
+        'author': comment.author.username,
+    }
+
+
+def group_data(group):
+    return {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }
+
+
+def author_data(author, counters):
+    return {
+        'username': author.username,
+        'name': author.get_full_name(),
+        'posts': counters.posts,
+        'followers': counters.followers,
+        'following': counters.following,
+    }
+
+
+def page_data(page, serialize):
+    """Объекты страницы и курсоры соседних страниц."""
+    return {
+        'results': [serialize(obj) for obj in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
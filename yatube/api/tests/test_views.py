@@ -0,0 +1,113 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from core import cache as generations
+from core.testing import RunOnCommitMixin
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiViewsTest(RunOnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = mixer.blend(Group)
+        for i in range(12):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_pages(self):
+        """Все страницы API отдают JSON с постами и курсором"""
+        self.client.force_login(self.reader)
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['text'], 'Пост 11')
+                self.assertIsNotNone(data['next'])
+                data = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(len(data['results']), 2)
+
+    def test_not_found(self):
+        """Несуществующие объекты дают 404"""
+        for url in (
+            reverse('api:group_list', args=['missing']),
+            reverse('api:profile', args=['missing']),
+            reverse('api:post_detail', args=[0]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_follow_requires_login(self):
+        """Лента доступна только авторизованному пользователю"""
+        response = self.client.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 403)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('api:follow_index'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_etag_revalidation(self):
+        """Повтор с ETag даёт 304 без запросов к базе, новый пост — 200"""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified_revalidation(self):
+        """If-Modified-Since сравнивается с датой нового комментария"""
+        url = reverse('api:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['post']['comments'], 0)
+        last_modified = response['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Last-Modified'], last_modified)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['text'], 'Комментарий')
+
+    def test_last_modified_follows_edits(self):
+        """Правка и удаление поста сдвигают Last-Modified вперёд"""
+        self.client.force_login(self.reader)
+        moment = time.time_ns()
+        for url in (reverse('api:index'), reverse('api:follow_index')):
+            last_modified = self.client.get(url)['Last-Modified']
+            post = Post.objects.create(author=self.author, text='Новый пост')
+            for change in ('save', 'delete'):
+                moment += 5 * 10 ** 9
+                with mock.patch.object(
+                    generations.time, 'time_ns', return_value=moment
+                ):
+                    getattr(post, change)()
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                with self.subTest(url=url, change=change):
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(
+                        response['Last-Modified'], last_modified)
+                last_modified = response['Last-Modified']
@@ -0,0 +1,144 @@
+"""JSON-версии страниц постов только для чтения.
+
+ETag строится из поколений кэша (core.cache), которые меняются при любой
+правке постов страницы, поэтому для ответа 304 на If-None-Match списков
+не нужна база. Last-Modified — время последней смены этих поколений: дата
+самого нового поста не меняется при правке и уходит назад при удалении.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_safe
+
+from core.cache import changed_at
+from core.conditional import conditional_response
+from posts import cache, feed
+from posts.counters import get_counters
+from posts.models import Group, Post, User
+from posts.utils import pagination
+
+from .serializers import (
+    author_data, comment_data, group_data, page_data, post_data,
+)
+
+API_VERSION = 1
+
+
+def conditional_json(request, validators, last_modified, build):
+    """JSON из build() или 304, см. core.conditional."""
+    response = conditional_response(
+        request,
+        (API_VERSION, *validators),
+        last_modified,
+        lambda: JsonResponse(build(), json_dumps_params={
+            'ensure_ascii': False, 'separators': (',', ':'),
+        }),
+    )
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_safe
+def index(request):
+    posts = Post.objects.select_related('author', 'group')
+    generation = cache.index_generation()
+    return conditional_json(
+        request,
+        (generation,),
+        lambda: changed_at(generation),
+        lambda: page_data(pagination(request, posts), post_data),
+    )
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    posts = group.group_posts.select_related('author', 'group')
+    generation = cache.group_generation(group)
+    return conditional_json(
+        request,
+        (generation,),
+        lambda: changed_at(generation),
+        lambda: {
+            'group': group_data(group),
+            **page_data(pagination(request, posts), post_data),
+        },
+    )
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    counters = get_counters(author)
+    posts = author.posts.select_related('author', 'group')
+    generation = cache.profile_generation(author)
+    return conditional_json(
+        request,
+        (
+            generation,
+            counters.posts, counters.followers, counters.following,
+        ),
+        lambda: changed_at(generation),
+        lambda: {
+            'author': author_data(author, counters),
+            **page_data(pagination(request, posts), post_data),
+        },
+    )
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    comments = post.comments.select_related('author')
+    generation = cache.post_generation(post)
+
+    def build():
+        page = pagination(
+            request,
+            comments,
+            per_page=settings.PAGINATOR_COMMENTS_PER_PAGE,
+            ordering=('created', 'pk'),
+        )
+        return {
+            'post': {**post_data(post), 'comments': post.comments_count},
+            **page_data(page, comment_data),
+        }
+
+    return conditional_json(
+        request,
+        (generation, post.comments_count),
+        lambda: changed_at(generation),
+        build,
+    )
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация'}, status=403)
+    # Лента дотягивает посты популярных авторов при чтении, поэтому
+    # собирается только для ответа, но не для 304.
+    entries = SimpleLazyObject(lambda: feed.entries_for(request.user))
+    generation = cache.feed_generation(request.user)
+    response = conditional_json(
+        request,
+        (generation, request.user.pk),
+        lambda: changed_at(generation),
+        lambda: page_data(
+            pagination(
+                request,
+                entries,
+                ordering=('-pub_date', '-post_id'),
+                transform=attrgetter('post'),
+            ),
+            post_data,
+        ),
+    )
+    patch_cache_control(response, private=True)
+    return response
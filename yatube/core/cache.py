@@ -0,0 +1,57 @@
+"""Поколения кэша.
+
+Ключ фрагмента включает текущие поколения своих пространств имён, поэтому
+вместо удаления ключей достаточно сменить поколение: старые фрагменты
+перестают читаться и вытесняются кэшем сами. Поколение — время смены в
+наносекундах, так что по нему же видно время последнего изменения.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'generation:{}'
+
+
+def _key(namespace):
+    return GENERATION_KEY.format(namespace)
+
+
+def get_generations(*namespaces):
+    """Возвращает поколения пространств имён, заводя недостающие."""
+    keys = {_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return {
+        namespace: found.get(key, 0) for key, namespace in keys.items()
+    }
+
+
+def generation(*namespaces):
+    """Строка для ключа фрагмента, зависящего от namespaces."""
+    generations = get_generations(*namespaces)
+    return '-'.join(str(generations[namespace]) for namespace in namespaces)
+
+
+def bump(*namespaces):
+    """Сбрасывает все фрагменты, зависящие от namespaces."""
+    if not namespaces:
+        return
+    now = time.time_ns()
+    cache.set_many({_key(namespace): now for namespace in namespaces}, None)
+
+
+def changed_at(generation_string):
+    """Время последнего изменения по строке из generation().
+
+    None, если поколения неизвестны (например, кэш отключён).
+    """
+    latest = max(int(part) for part in generation_string.split('-'))
+    if not latest:
+        return None
+    return datetime.fromtimestamp(latest / 1e9, timezone.utc)
@@ -0,0 +1,45 @@
+"""Условные ответы: ETag и Last-Modified по дешёвым признакам изменений.
+
+Ответ строится, только если копия клиента устарела; иначе отдаётся 304.
+ETag — хеш адреса и validators (обычно поколения core.cache, которые
+меняются при любой правке данных страницы).
+"""
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_response(request, validators, last_modified, build,
+                         weak=False):
+    """Ответ build() или 304, если копия клиента ещё актуальна.
+
+    last_modified — функция, возвращающая дату или None. Она вызывается,
+    только когда дата действительно нужна: с If-None-Match клиент
+    проверяется по одному ETag. Слабый ETag нужен страницам, байты
+    которых могут отличаться при том же содержании, например из-за
+    маскированного CSRF-токена.
+    """
+    etag = quote_etag(hashlib.sha256(repr((
+        request.get_full_path(), *validators,
+    )).encode()).hexdigest()[:32])
+    if weak:
+        etag = 'W/' + etag
+    timestamp = None
+    if 'HTTP_IF_NONE_MATCH' not in request.META:
+        timestamp = _timestamp(last_modified())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+        if timestamp is None:
+            timestamp = _timestamp(last_modified())
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def _timestamp(value):
+    return None if value is None else timegm(value.utctimetuple())
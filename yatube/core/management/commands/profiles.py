@@ -0,0 +1,74 @@
+import io
+import pstats
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает сохранённые профили медленных запросов или сводку '
+        'одного профиля'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'name', nargs='?',
+            help='Имя профиля: показать горячие функции и медленный SQL')
+        parser.add_argument(
+            '--view', help='Показывать профили только этого представления')
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=('cumulative', 'tottime', 'calls'),
+            help='Порядок функций в сводке')
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Сколько функций и запросов показывать')
+        parser.add_argument(
+            '--token', action='store_true',
+            help='Выдать значение заголовка X-Profile')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.make_token())
+        elif options['name']:
+            self.summarize(options['name'], options['sort'], options['top'])
+        else:
+            self.list(options['view'])
+
+    def list(self, view):
+        for name in reversed(profiling.captures()):
+            info, _ = profiling.load(name)
+            if view and info['view'] != view:
+                continue
+            self.stdout.write('{}  {:%Y-%m-%d %H:%M:%S}  {:>9.1f} мс  '
+                              '{:>4} SQL  {} {}'.format(
+                                  name,
+                                  datetime.fromtimestamp(info['started']),
+                                  info['ms'],
+                                  len(info['queries']),
+                                  info['method'],
+                                  info['path'],
+                              ))
+
+    def summarize(self, name, sort, top):
+        try:
+            info, path = profiling.load(name)
+        except FileNotFoundError:
+            raise CommandError(f'Профиль {name} не найден')
+        query_ms = sum(query['ms'] for query in info['queries'])
+        self.stdout.write(
+            '{view}: {method} {path} -> {status}, {ms:.1f} мс'.format(**info))
+        self.stdout.write('SQL: {} запросов, {:.1f} мс'.format(
+            len(info['queries']), query_ms))
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(top)
+        self.stdout.write(output.getvalue())
+        slowest = sorted(
+            info['queries'], key=lambda query: query['ms'], reverse=True)
+        for query in slowest[:top]:
+            self.stdout.write('{:>9.3f} мс  {}'.format(
+                query['ms'], query['sql']))
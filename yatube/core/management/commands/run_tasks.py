@@ -0,0 +1,95 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from core import tasks, worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди core.tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASKS_WORKERS,
+            help='Размер пула процессов; 0 выполняет задачи в этом процессе')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых задач не останется')
+        parser.add_argument(
+            '--local-cache', action='store_true',
+            help='Не требовать общего кэша (задачи и страницы в одном '
+                 'процессе)')
+
+    def handle(self, *args, **options):
+        # Задачи сбрасывают поколения и пишут миниатюры в кэш: кэш в
+        # памяти воркера веб-процессы не увидят.
+        if (isinstance(caches['default'], LocMemCache)
+                and not options['local_cache']):
+            raise CommandError(
+                'Кэш в памяти процесса не виден веб-процессам: задайте '
+                'общий CACHE_BACKEND или работайте с TASKS_EAGER=1.')
+        self.stopping = False
+        previous = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            if options['processes']:
+                self.run_pool(options['processes'], options['poll'],
+                              options['once'])
+            else:
+                self.run_inline(options['poll'], options['once'])
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run_inline(self, poll, once):
+        while not self.stopping:
+            claimed = tasks.claim(1)
+            for task_id in claimed:
+                worker.execute(task_id)
+            if not claimed:
+                if once:
+                    break
+                time.sleep(poll)
+
+    def run_pool(self, processes, poll, once):
+        # Дочерние процессы запускаются заново, а не форком, чтобы не
+        # унаследовать открытые соединения с базой.
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            processes, mp_context=context, initializer=worker.setup
+        ) as pool:
+            running = set()
+            while not self.stopping:
+                free = processes - len(running)
+                claimed = tasks.claim(free) if free else []
+                close_old_connections()
+                running.update(
+                    pool.submit(worker.execute, task_id)
+                    for task_id in claimed
+                )
+                if running:
+                    done, running = wait(
+                        running, timeout=poll, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                elif once:
+                    break
+                else:
+                    time.sleep(poll)
+            wait(running)
@@ -0,0 +1,239 @@
+"""Метрики производительности по страницам.
+
+За время запроса MetricsMiddleware собирает число и время SQL-запросов,
+попадания и промахи кэша, время отрисовки шаблонов и полное время ответа.
+Итоги складываются в гистограммы процесса по имени представления и
+отдаются в текстовом формате Prometheus. Каждый процесс считает своё,
+так что собирать метрики нужно с каждого процесса отдельно.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import MemcachedCache
+from django.template.backends import django as django_backend
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_metrics', default=None)
+# get_many базового бэкенда кэша вызывает get, это не должно считаться
+# дважды.
+_in_get_many = ContextVar('in_cache_get_many', default=False)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, время в миллисекундах."""
+        return ', '.join((
+            'db;dur={:.1f};desc="{} queries"'.format(
+                self.query_time * 1000, self.queries),
+            'cache;desc="{} hits {} misses"'.format(
+                self.cache_hits, self.cache_misses),
+            'tpl;dur={:.1f}'.format(self.template_time * 1000),
+            'total;dur={:.1f}'.format(total * 1000),
+        ))
+
+
+def start_request():
+    return _current.set(RequestMetrics())
+
+
+def finish_request(token):
+    metrics = _current.get()
+    _current.reset(token)
+    return metrics
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper: время каждого SQL-запроса."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_time += time.perf_counter() - started
+
+
+def record_cache(hits, misses):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield '{}_bucket{{{},le="{}"}} {}'.format(
+                name, labels, bound, total)
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {total}'
+
+
+class Registry:
+    """Гистограммы и счётчики процесса, разбитые по представлениям."""
+
+    HISTOGRAMS = (
+        ('request_duration_seconds', 'Полное время ответа', DURATION_BUCKETS),
+        ('db_queries', 'SQL-запросов за запрос', QUERY_BUCKETS),
+        ('db_duration_seconds', 'Время SQL за запрос', DURATION_BUCKETS),
+        ('template_duration_seconds', 'Время шаблонов за запрос',
+         DURATION_BUCKETS),
+    )
+    COUNTERS = (
+        ('requests_total', 'Ответы по кодам'),
+        ('cache_hits_total', 'Попадания в кэш'),
+        ('cache_misses_total', 'Промахи кэша'),
+    )
+
+    def __init__(self, prefix='yatube_'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name, *_ in self.HISTOGRAMS}
+            self.counters = {name: {} for name, _ in self.COUNTERS}
+
+    def observe(self, view, status, metrics, total):
+        values = {
+            'request_duration_seconds': total,
+            'db_queries': metrics.queries,
+            'db_duration_seconds': metrics.query_time,
+            'template_duration_seconds': metrics.template_time,
+        }
+        view = view.replace('\\', '\\\\').replace('"', '\\"')
+        with self.lock:
+            for name, _, buckets in self.HISTOGRAMS:
+                histograms = self.histograms[name]
+                if view not in histograms:
+                    histograms[view] = Histogram(buckets)
+                histograms[view].observe(values[name])
+            for name, labels, value in (
+                ('requests_total', f'view="{view}",status="{status}"', 1),
+                ('cache_hits_total', f'view="{view}"', metrics.cache_hits),
+                ('cache_misses_total', f'view="{view}"',
+                 metrics.cache_misses),
+            ):
+                counters = self.counters[name]
+                counters[labels] = counters.get(labels, 0) + value
+
+    def render(self):
+        """Текстовый формат Prometheus."""
+        lines = []
+        with self.lock:
+            for name, description, _ in self.HISTOGRAMS:
+                full_name = self.prefix + name
+                lines.append(f'# HELP {full_name} {description}')
+                lines.append(f'# TYPE {full_name} histogram')
+                for view, histogram in sorted(self.histograms[name].items()):
+                    lines.extend(histogram.lines(full_name, f'view="{view}"'))
+            for name, description in self.COUNTERS:
+                full_name = self.prefix + name
+                lines.append(f'# HELP {full_name} {description}')
+                lines.append(f'# TYPE {full_name} counter')
+                for labels, value in sorted(self.counters[name].items()):
+                    lines.append(f'{full_name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи для MetricsMiddleware.
+
+    Подмешивается к любому бэкенду кэша, см. LocMemMetricsCache.
+    """
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if _in_get_many.get():
+            return default if value is self._missing else value
+        if value is self._missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        token = _in_get_many.set(True)
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            _in_get_many.reset(token)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemMetricsCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+class FileBasedMetricsCache(CacheMetricsMixin, FileBasedCache):
+    pass
+
+
+class MemcachedMetricsCache(CacheMetricsMixin, MemcachedCache):
+    pass
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Шаблон, отрисованный изнутри другого, уже учтён во внешнем.
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django, замеряющий время отрисовки."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,125 @@
+import cProfile
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, profiling, routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса и добавляет заголовок Server-Timing.
+
+    Стоит первым в MIDDLEWARE, чтобы полное время включало остальные
+    middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            request_metrics = metrics.finish_request(token)
+        total = time.perf_counter() - request_metrics.started
+        match = request.resolver_match
+        metrics.registry.observe(
+            match.view_name if match else 'unresolved',
+            response.status_code,
+            request_metrics,
+            total,
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = request_metrics.server_timing(total)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует часть запросов, см. core.profiling."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request._profiling = None
+        response = self.get_response(request)
+        if request._profiling is None:
+            return response
+        profiler, stack, logs, forced = request._profiling
+        stack.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        if forced or elapsed >= settings.PROFILE_THRESHOLD_MS:
+            response['X-Profile-Name'] = profiling.save(profiler, {
+                'view': request.resolver_match.view_name,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'ms': round(elapsed, 3),
+                'forced': forced,
+                'started': time.time() - elapsed / 1000,
+                'queries': [query for log in logs for query in log.queries],
+            })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        token = request.headers.get('X-Profile')
+        forced = bool(token) and profiling.check_token(token)
+        if not forced and (
+            request.resolver_match.namespace
+            not in settings.PROFILE_NAMESPACES
+            or random.random() >= settings.PROFILE_SAMPLE_RATE
+        ):
+            return None
+        stack = ExitStack()
+        logs = []
+        for connection in connections.all():
+            log = profiling.QueryLog(connection.alias)
+            stack.enter_context(connection.execute_wrapper(log))
+            logs.append(log)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        stack.callback(profiler.disable)
+        request._profiling = profiler, stack, logs, forced
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Закрепляет пользователя за основной базой после его записи.
+
+    Кука ставится только после небезопасных методов: записи, которые
+    попутно делает GET (например, дотягивание ленты в feed.pull), не
+    закрепляют читателя навсегда.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tokens = routers.start_request(
+            settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            written = routers.finish_request(tokens)
+        if (written and settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
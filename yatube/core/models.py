@@ -0,0 +1,66 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Задача очереди core.tasks, ждущая выполнения воркером."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+        help_text='Модуль и имя функции'
+    )
+    args = models.TextField(
+        default='[]',
+        verbose_name='Аргументы',
+        help_text='Список аргументов в JSON'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Состояние'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Выполнить после'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята воркером'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Поставлена'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='task_status_run_at_idx'),
+            models.Index(
+                fields=['name', 'args'],
+                name='task_name_args_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
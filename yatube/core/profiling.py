@@ -0,0 +1,89 @@
+"""Профили медленных запросов.
+
+ProfilingMiddleware запускает cProfile для доли PROFILE_SAMPLE_RATE
+запросов к представлениям из PROFILE_NAMESPACES и для запросов с
+подписанным заголовком X-Profile. Профиль сохраняется, если ответ шёл
+дольше PROFILE_THRESHOLD_MS (по заголовку — всегда): рядом с файлом
+pstats (.prof) лежит .json с представлением, адресом и журналом SQL.
+В каталоге PROFILE_DIR остаётся не больше PROFILE_MAX_FILES профилей.
+"""
+import json
+import os
+import time
+from contextlib import suppress
+
+from django.conf import settings
+from django.core import signing
+
+TOKEN_SALT = 'core.profiling'
+TOKEN_VALUE = 'profile'
+
+
+def make_token():
+    """Значение заголовка X-Profile, действует PROFILE_TOKEN_MAX_AGE."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def check_token(token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+class QueryLog:
+    """Обёртка для connection.execute_wrapper, записывающая SQL."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'database': self.alias,
+                'sql': sql,
+                'params': None if many else repr(params),
+                'many': many,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+def save(profiler, info):
+    """Сохраняет профиль и сведения о запросе, удаляя самые старые."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    name = '{}-{}'.format(
+        time.time_ns(), info['view'].replace(':', '.').replace('/', '.'))
+    base = os.path.join(settings.PROFILE_DIR, name)
+    profiler.dump_stats(base + '.prof')
+    with open(base + '.json', 'w') as info_file:
+        json.dump(info, info_file, ensure_ascii=False, indent=1)
+    for old in captures()[:-settings.PROFILE_MAX_FILES]:
+        for extension in ('.json', '.prof'):
+            with suppress(FileNotFoundError):
+                os.remove(os.path.join(settings.PROFILE_DIR, old + extension))
+    return name
+
+
+def captures():
+    """Имена сохранённых профилей от старых к новым."""
+    try:
+        files = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (name[:-len('.json')] for name in files if name.endswith('.json')),
+        key=lambda name: int(name.split('-', 1)[0]),
+    )
+
+
+def load(name):
+    """Сведения о запросе и путь к файлу pstats."""
+    base = os.path.join(settings.PROFILE_DIR, name)
+    with open(base + '.json') as info_file:
+        return json.load(info_file), base + '.prof'
@@ -0,0 +1,44 @@
+"""Маршрутизация запросов к базе между основной базой и репликами.
+
+Чтение уходит на случайную реплику, запись — в основную базу. После
+записи чтение в том же запросе идёт в основную базу. Запросы с записью
+небезопасным методом (POST и т. п.) ставят куку REPLICA_PIN_COOKIE, и
+пока она живёт, пользователь читает из основной базы, чтобы сразу видеть
+свои изменения, даже если реплика отстаёт.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+_written = ContextVar('written_to_primary', default=False)
+
+
+def start_request(pinned):
+    """Сбрасывает состояние маршрутизации в начале запроса."""
+    return _pinned.set(pinned), _written.set(False)
+
+
+def finish_request(tokens):
+    """Возвращает состояние маршрутизации и сообщает, была ли запись."""
+    written = _written.get()
+    pinned_token, written_token = tokens
+    _pinned.reset(pinned_token)
+    _written.reset(written_token)
+    return written
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or _pinned.get() or _written.get():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,140 @@
+"""Очередь фоновых задач в базе.
+
+Задача — функция, помеченная @task. Вызов f.delay(*args) после коммита
+текущей транзакции записывает строку Task, а `manage.py run_tasks`
+выполняет такие строки пулом процессов. Упавшая задача повторяется через
+TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд, но не позже
+TASKS_MAX_RETRY_DELAY; после TASKS_MAX_ATTEMPTS попыток она остаётся в
+таблице со статусом failed. Задачу, воркер которой умер, через
+TASKS_LOCK_TIMEOUT секунд берёт другой воркер, поэтому задачи должны
+спокойно переносить повторный запуск.
+
+f.schedule(seconds, *args) ставит задачу не раньше, чем через seconds
+секунд. С TASKS_EAGER задача выполняется после коммита в том же процессе
+без очереди и без отсрочки: так работают тесты и разработка без воркера.
+Откаченная транзакция не выполняет задачу ни в каком режиме.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(function=None, *, unique=False):
+    """Регистрирует функцию как задачу и добавляет ей метод delay.
+
+    Аргументы задачи проходят через JSON. unique не ставит задачу, если
+    такая же с теми же аргументами уже ждёт в очереди.
+    """
+    def decorate(function):
+        name = f'{function.__module__}.{function.__name__}'
+        registry[name] = function
+        function.task_name = name
+        function.delay = lambda *args: enqueue(name, args, unique)
+        function.schedule = lambda seconds, *args: enqueue(
+            name, args, unique, seconds)
+        return function
+
+    if function is not None:
+        return decorate(function)
+    return decorate
+
+
+def _tasks():
+    # Очередь читается только из основной базы: реплика может отставать.
+    return Task.objects.using(router.db_for_write(Task))
+
+
+def enqueue(name, args, unique=False, seconds=0):
+    args = json.dumps(list(args))
+    if settings.TASKS_EAGER:
+        transaction.on_commit(lambda: registry[name](*json.loads(args)))
+        return
+    transaction.on_commit(lambda: _insert(name, args, unique, seconds))
+
+
+def _insert(name, args, unique, seconds=0):
+    tasks = _tasks()
+    if unique and tasks.filter(
+        name=name, args=args, status=Task.QUEUED
+    ).exists():
+        return
+    tasks.create(
+        name=name,
+        args=args,
+        run_at=timezone.now() + timedelta(seconds=seconds),
+    )
+
+
+def claim(limit):
+    """Берёт до limit готовых задач и возвращает их id.
+
+    Задача берётся обновлением с условием на прежние status и locked_at,
+    поэтому два воркера не получат одну задачу.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    candidates = _tasks().filter(
+        Q(status=Task.QUEUED, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_at__lt=stale)
+    ).order_by('run_at', 'pk').values_list('pk', 'status', 'locked_at')
+    claimed = []
+    for pk, status, locked_at in candidates[:limit]:
+        if _tasks().filter(
+            pk=pk, status=status, locked_at=locked_at
+        ).update(
+            status=Task.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(
+        settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASKS_MAX_RETRY_DELAY,
+    ))
+
+
+def execute(task_id):
+    """Выполняет взятую задачу: удаляет её или планирует повтор."""
+    task = _tasks().filter(pk=task_id).first()
+    if task is None:
+        return
+    try:
+        function = registry.get(task.name)
+        if function is None:
+            raise LookupError(f'Неизвестная задача {task.name}')
+        with transaction.atomic(using=_tasks().db):
+            function(*json.loads(task.args))
+    except Exception:
+        logger.exception('Задача %s упала', task)
+        _fail(task, traceback.format_exc())
+    else:
+        _tasks().filter(pk=task_id).delete()
+
+
+def _fail(task, error):
+    tasks = _tasks().filter(pk=task.pk)
+    if task.attempts >= settings.TASKS_MAX_ATTEMPTS:
+        tasks.update(status=Task.FAILED, last_error=error)
+        return
+    tasks.update(
+        status=Task.QUEUED,
+        run_at=timezone.now() + retry_delay(task.attempts),
+        locked_at=None,
+        last_error=error,
+    )
@@ -0,0 +1,32 @@
+"""Помощники тестов."""
+from unittest import mock
+
+from django.db import transaction
+
+
+class RunOnCommitMixin:
+    """Выполняет колбэки transaction.on_commit сразу при регистрации.
+
+    TestCase не фиксирует свою транзакцию, поэтому задачи core.tasks и
+    другие действия после коммита иначе не выполнились бы вовсе. Каждая
+    запись в таком тесте считается зафиксированной.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._on_commit = mock.patch.object(
+            transaction, 'on_commit',
+            lambda function, using=None: function())
+        cls._on_commit.start()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._on_commit.stop()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._on_commit.stop()
@@ -0,0 +1,78 @@
+import re
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import registry
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+
+    def server_timing(self, response):
+        return dict(
+            re.match(r'(\w+);(.*)', part.strip()).groups()
+            for part in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_header(self):
+        """Ответ содержит время SQL, кэша, шаблонов и полное время."""
+        response = self.client.get(reverse('posts:index'))
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'cache', 'tpl', 'total'})
+        self.assertRegex(timing['db'], r'desc="[1-9]\d* queries"')
+        self.assertNotEqual(timing['tpl'], 'dur=0.0')
+
+    def test_cache_hits_counted(self):
+        """Повторный запрос берёт фрагменты из кэша."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(
+            'desc="0 hits ', self.server_timing(response)['cache'])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        """/metrics отдаёт гистограммы по именам представлений."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', body)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            body)
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 1', body)
+        self.assertRegex(
+            body, r'yatube_db_queries_bucket\{view="posts:index",le="\+Inf"\}')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_access(self):
+        """С чужого адреса метрики доступны только по токену."""
+        url = reverse('metrics')
+        remote = {'REMOTE_ADDR': '10.0.0.1'}
+        self.assertEqual(self.client.get(url, **remote).status_code, 403)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer secret', **remote)
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_closed_by_default(self):
+        """Без токена и явного списка адресов метрики закрыты и локально."""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=('127.0.0.1',))
+    def test_proxied_request_not_allowed_by_address(self):
+        """Запрос через прокси на том же хосте не проходит по адресу."""
+        url = reverse('metrics')
+        local = {'REMOTE_ADDR': '127.0.0.1'}
+        self.assertEqual(self.client.get(url, **local).status_code, 200)
+        response = self.client.get(
+            url, HTTP_X_FORWARDED_FOR='203.0.113.5', **local)
+        self.assertEqual(response.status_code, 403)
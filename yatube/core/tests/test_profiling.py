@@ -0,0 +1,60 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import profiling
+
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILE_DIR=PROFILE_DIR, PROFILE_SAMPLE_RATE=0,
+                   FULL_PAGE_CACHE_TIMEOUT=0)
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def test_not_profiled_without_header(self):
+        """Без выборки и заголовка профили не пишутся."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('X-Profile-Name', response)
+        self.assertEqual(profiling.captures(), [])
+
+    def test_bad_token_ignored(self):
+        """Заголовок с неверной подписью не включает профилирование."""
+        response = self.client.get(
+            reverse('posts:index'), HTTP_X_PROFILE='profile:forged')
+        self.assertNotIn('X-Profile-Name', response)
+
+    def test_signed_header_saves_profile(self):
+        """Запрос с подписанным заголовком сохраняет профиль и SQL."""
+        response = self.client.get(
+            reverse('posts:index'), HTTP_X_PROFILE=profiling.make_token())
+        name = response['X-Profile-Name']
+        self.assertEqual(profiling.captures(), [name])
+        info, _ = profiling.load(name)
+        self.assertEqual(info['view'], 'posts:index')
+        self.assertTrue(info['queries'])
+        output = StringIO()
+        call_command('profiles', name, '--top=5', stdout=output)
+        self.assertIn('posts:index', output.getvalue())
+        self.assertIn('cumulative', output.getvalue())
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_THRESHOLD_MS=0,
+                       PROFILE_MAX_FILES=2)
+    def test_sampled_profiles_rotate(self):
+        """Выборка пишет профили медленных запросов, старые удаляются."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('about:author'))
+        self.assertNotIn('X-Profile-Name', response)
+        self.assertEqual(len(profiling.captures()), 2)
+        output = StringIO()
+        call_command('profiles', stdout=output)
+        self.assertEqual(output.getvalue().count('GET /'), 2)
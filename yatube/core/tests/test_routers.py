@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts.models import Group
+
+from ..middleware import ReplicaRoutingMiddleware
+from ..routers import PrimaryReplicaRouter
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, write=False):
+        """Выполняет запрос и возвращает базы для чтения до и после записи."""
+        used = []
+
+        def view(request):
+            used.append(self.router.db_for_read(Group))
+            if write:
+                self.router.db_for_write(Group)
+                used.append(self.router.db_for_read(Group))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return used, response
+
+    def test_get_reads_from_replica(self):
+        """Чтение без записи уходит на реплику."""
+        used, response = self.run_request(self.factory.get('/'))
+        self.assertEqual(used, ['replica1'])
+        self.assertNotIn('read_primary', response.cookies)
+
+    def test_read_after_write_uses_primary(self):
+        """После записи чтение идёт в основную базу и ставится кука."""
+        used, response = self.run_request(
+            self.factory.post('/'), write=True)
+        self.assertEqual(used, ['replica1', 'default'])
+        self.assertIn('read_primary', response.cookies)
+
+    def test_get_write_does_not_pin(self):
+        """Попутная запись в GET не ставит куку закрепления."""
+        used, response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(used, ['replica1', 'default'])
+        self.assertNotIn('read_primary', response.cookies)
+
+    def test_pin_cookie_reads_from_primary(self):
+        """С кукой после записи чтение идёт в основную базу."""
+        request = self.factory.get('/')
+        request.COOKIES['read_primary'] = '1'
+        used, _ = self.run_request(request)
+        self.assertEqual(used, ['default'])
+
+    def test_write_does_not_leak_into_next_request(self):
+        """Запись в одном запросе не закрепляет следующий без куки."""
+        self.run_request(self.factory.post('/'), write=True)
+        used, _ = self.run_request(self.factory.get('/'))
+        self.assertEqual(used, ['replica1'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_from_primary(self):
+        """Без реплик всё читается из основной базы."""
+        used, response = self.run_request(self.factory.get('/'))
+        self.assertEqual(used, ['default'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class SqliteReplicaTest(TestCase):
+    """Основная база и реплика — разные файлы SQLite с разными данными."""
+
+    databases = {'default', 'replica1'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica1'] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        with connections['replica1'].schema_editor() as editor:
+            editor.create_model(Group)
+        Group.objects.using('replica1').create(
+            title='На реплике', slug='replica')
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.databases['replica1']
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        Group.objects.using('default').create(
+            title='В основной базе', slug='primary')
+        self.factory = RequestFactory()
+
+    def slugs(self, request, write=False):
+        """Слаги групп, прочитанные в запросе, и ответ."""
+        slugs = []
+
+        def view(request):
+            if write:
+                Group.objects.create(title='Новая', slug='new')
+            slugs.extend(Group.objects.values_list('slug', flat=True))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return sorted(slugs), response
+
+    def test_read_served_by_replica(self):
+        """Чтение без записи получает данные из файла реплики."""
+        slugs, _ = self.slugs(self.factory.get('/'))
+        self.assertEqual(slugs, ['replica'])
+
+    def test_own_write_visible_in_same_request(self):
+        """После записи запрос читает свою запись из основной базы."""
+        slugs, response = self.slugs(self.factory.post('/'), write=True)
+        self.assertEqual(slugs, ['new', 'primary'])
+        self.assertIn('read_primary', response.cookies)
+
+    def test_pin_cookie_reads_primary_data(self):
+        """С кукой следующий запрос видит данные основной базы."""
+        _, response = self.slugs(self.factory.post('/'), write=True)
+        request = self.factory.get('/')
+        request.COOKIES['read_primary'] = (
+            response.cookies['read_primary'].value)
+        slugs, _ = self.slugs(request)
+        self.assertEqual(slugs, ['new', 'primary'])
+        slugs, _ = self.slugs(self.factory.get('/'))
+        self.assertEqual(slugs, ['replica'])
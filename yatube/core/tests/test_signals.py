@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+
+class SqlitePragmasTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Соединение с SQLite получает PRAGMA из настроек."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Нужна SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0],
+                settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts.models import FeedEntry, Follow, Post, User
+
+from .. import tasks
+from ..models import Task
+
+calls = []
+
+
+@tasks.task
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(unique=True)
+def record_once(value):
+    calls.append(value)
+
+
+@tasks.task
+def broken():
+    raise ValueError('сломано')
+
+
+@override_settings(TASKS_EAGER=True)
+class EagerTasksTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_eager_runs_after_commit(self):
+        """С TASKS_EAGER задача выполняется в процессе после коммита."""
+        with transaction.atomic():
+            record.delay('после коммита')
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ['после коммита'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_eager_skipped_on_rollback(self):
+        """Откаченная транзакция не выполняет задачу."""
+        with transaction.atomic():
+            record.delay('откат')
+            transaction.set_rollback(True)
+        self.assertEqual(calls, [])
+
+
+@override_settings(TASKS_EAGER=False, TASKS_MAX_ATTEMPTS=3,
+                   TASKS_RETRY_DELAY=10, TASKS_MAX_RETRY_DELAY=15)
+class TaskQueueTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_after_commit(self):
+        """Задача попадает в очередь только после коммита."""
+        with transaction.atomic():
+            record.delay(1)
+            self.assertFalse(Task.objects.exists())
+        task = Task.objects.get()
+        self.assertEqual((task.name, task.args), (record.task_name, '[1]'))
+        with transaction.atomic():
+            record.delay(2)
+            transaction.set_rollback(True)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_scheduled_task_waits(self):
+        """Отложенная задача не берётся воркером раньше времени."""
+        record.schedule(60, 1)
+        self.assertEqual(tasks.claim(1), [])
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(len(tasks.claim(1)), 1)
+
+    def test_unique_task_queued_once(self):
+        """Одинаковая уникальная задача не ставится дважды."""
+        record_once.delay(1)
+        record_once.delay(1)
+        record_once.delay(2)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_worker_runs_and_deletes_tasks(self):
+        """Воркер выполняет задачи по порядку и удаляет их."""
+        record.delay(1)
+        record.delay(2)
+        call_command('run_tasks', processes=0, once=True, local_cache=True)
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_worker_requires_shared_cache(self):
+        """Воркер не запускается с кэшем в памяти процесса."""
+        record.delay(1)
+        with self.assertRaises(CommandError):
+            call_command('run_tasks', processes=0, once=True)
+        self.assertEqual(calls, [])
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется с растущей паузой, затем failed."""
+        broken.delay()
+        for delay in (10, 15):
+            started = timezone.now()
+            with self.assertLogs('core.tasks', 'ERROR'):
+                tasks.execute(*tasks.claim(1))
+            task = Task.objects.get()
+            self.assertEqual(task.status, Task.QUEUED)
+            self.assertIn('сломано', task.last_error)
+            self.assertGreaterEqual(
+                task.run_at, started + timedelta(seconds=delay))
+            self.assertEqual(tasks.claim(1), [])
+            Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.execute(*tasks.claim(1))
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 3))
+        self.assertEqual(tasks.claim(1), [])
+
+    @override_settings(TASKS_LOCK_TIMEOUT=60)
+    def test_stale_task_reclaimed(self):
+        """Задачу зависшего воркера забирают только после таймаута."""
+        record.delay(1)
+        task_id, = tasks.claim(1)
+        self.assertEqual(tasks.claim(1), [])
+        Task.objects.update(
+            locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(tasks.claim(1), [task_id])
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_post_side_effects_run_in_worker(self):
+        """Лента подписчика заполняется воркером, а не запросом."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        call_command('run_tasks', processes=0, once=True, local_cache=True)
+        post = Post.objects.create(author=author, text='Пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        call_command('run_tasks', processes=0, once=True, local_cache=True)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=post).exists())
+        self.assertFalse(Task.objects.exists())
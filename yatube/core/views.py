@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
+
+from . import metrics as request_metrics
 
 
 def permission_denied(request, exception):
@@ -15,3 +22,40 @@ def page_not_found(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def serve_media(request, path, document_root=None):
+    """Раздача медиафайлов при DEBUG с теми же заголовками, что и в бою."""
+    response = serve(request, path, document_root=document_root)
+    response['Cache-Control'] = settings.MEDIA_CACHE_CONTROL
+    return response
+
+
+PROXY_HEADERS = (
+    'HTTP_X_FORWARDED_FOR', 'HTTP_FORWARDED', 'HTTP_X_REAL_IP',
+)
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Доступны с заголовком «Authorization: Bearer <METRICS_TOKEN>» или,
+    если список задан явно, с адресов METRICS_ALLOWED_IPS. Запрос через
+    обратный прокси приходит с его адреса, поэтому запросы с заголовками
+    прокси по адресу не пропускаются.
+    """
+    allowed = (
+        request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        and not any(header in request.META for header in PROXY_HEADERS)
+    )
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        allowed = True
+    if not allowed:
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
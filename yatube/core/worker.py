@@ -0,0 +1,25 @@
+"""Функции процессов пула `manage.py run_tasks`.
+
+Процесс пула загружает этот модуль до django.setup(), поэтому модели
+импортируются только внутри функций.
+"""
+import signal
+
+import django
+from django.db import close_old_connections
+
+
+def setup():
+    # Останавливает воркеров родитель: сначала дожидается их задач.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+
+
+def execute(task_id):
+    from core import tasks
+
+    close_old_connections()
+    try:
+        tasks.execute(task_id)
+    finally:
+        close_old_connections()
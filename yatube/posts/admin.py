@@ -1,4 +1,6 @@
 from django.contrib import admin
+
+from . import search
 from .models import Post, Group, Comment
 
 
@@ -7,8 +9,24 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    readonly_fields = ('comments_count',)
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        # Счётчик комментариев меняют только сигналы: правка сохраняет
+        # лишь изменённые в форме поля.
+        if change:
+            obj.save(update_fields=form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу, а не перебором текстов."""
+        if not search_term:
+            return queryset, False
+        entries = search.search(search_term, using=queryset.db)
+        return queryset.filter(pk__in=entries.values('post')), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
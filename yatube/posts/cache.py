@@ -0,0 +1,169 @@
+import hashlib
+
+from django.conf import settings
+
+from core import cache as generations
+
+from .models import Follow, Group
+
+INDEX_NAMESPACE = 'posts'
+CELEBRITIES_NAMESPACE = 'feed:celebrities'
+
+
+def group_namespace(group_id):
+    return f'group:{group_id}'
+
+
+def author_namespace(author_id):
+    return f'author:{author_id}'
+
+
+def feed_namespace(user_id):
+    return f'feed:{user_id}'
+
+
+def _digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+# Целые страницы анонимов (posts.middleware) ищутся по адресу до вызова
+# представления, поэтому их пространства называются тем, что есть в адресе.
+# Slug и имя берутся хэшем: кириллица и пробелы из адреса недопустимы в
+# ключах memcached.
+
+
+def group_page_namespace(slug):
+    return f'page:group:{_digest(slug)}'
+
+
+def profile_page_namespace(username):
+    return f'page:profile:{_digest(username)}'
+
+
+def post_page_namespace(post_id):
+    return f'page:post:{post_id}'
+
+
+# Пространства, от которых зависят целые страницы, по аргументам адреса.
+PAGE_NAMESPACES = {
+    'posts:index': lambda: [INDEX_NAMESPACE],
+    'posts:group_list': lambda slug: [group_page_namespace(slug)],
+    'posts:profile': lambda username: [profile_page_namespace(username)],
+    'posts:post_detail': lambda post_id: [post_page_namespace(post_id)],
+}
+
+
+def page_generation(view_name, kwargs):
+    """Поколение целой страницы или None, если её нельзя кэшировать."""
+    namespaces = PAGE_NAMESPACES.get(view_name)
+    if namespaces is None:
+        return None
+    return generations.generation(*namespaces(**kwargs))
+
+
+def index_generation():
+    return generations.generation(INDEX_NAMESPACE)
+
+
+def group_generation(group):
+    return generations.generation(group_namespace(group.pk))
+
+
+def author_generation(author):
+    return generations.generation(author_namespace(author.pk))
+
+
+def profile_generation(author):
+    """Поколение профиля: посты автора и счётчики его подписок."""
+    return generations.generation(
+        author_namespace(author.pk), profile_page_namespace(author.username))
+
+
+def post_generation(post):
+    """Поколение поста: сам пост и его комментарии."""
+    return generations.generation(post_page_namespace(post.pk))
+
+
+def feed_generation(user):
+    """Поколение ленты пользователя для ключей кэша фрагментов.
+
+    Складывается из поколения самого пользователя и общего поколения
+    постов популярных авторов, которые не раскладываются по лентам.
+    """
+    return generations.generation(
+        feed_namespace(user.pk), CELEBRITIES_NAMESPACE
+    )
+
+
+def invalidate_post(post, *group_ids):
+    """Сбрасывает страницы, на которых показывается post."""
+    group_ids = {
+        group_id for group_id in {post.group_id, *group_ids}
+        if group_id is not None
+    }
+    namespaces = [
+        INDEX_NAMESPACE,
+        author_namespace(post.author_id),
+        profile_page_namespace(post.author.username),
+        post_page_namespace(post.pk),
+    ]
+    namespaces.extend(group_namespace(group_id) for group_id in group_ids)
+    if group_ids:
+        namespaces.extend(
+            group_page_namespace(slug)
+            for slug in Group.objects.filter(
+                pk__in=group_ids).values_list('slug', flat=True)
+        )
+    generations.bump(*namespaces)
+
+
+def invalidate_comment(comment):
+    generations.bump(post_page_namespace(comment.post_id))
+
+
+def invalidate_follow(follow):
+    """Сбрасывает профили, в которых видны счётчики подписок."""
+    generations.bump(
+        profile_page_namespace(follow.user.username),
+        profile_page_namespace(follow.author.username),
+    )
+
+
+def invalidate_group(group, previous_slug=None):
+    authors = group.group_posts.order_by().values_list(
+        'author', 'author__username'
+    ).distinct()
+    generations.bump(
+        INDEX_NAMESPACE,
+        group_namespace(group.pk),
+        *(
+            group_page_namespace(slug)
+            for slug in {group.slug, previous_slug} if slug
+        ),
+        *(
+            namespace
+            for author_id, username in authors
+            for namespace in (
+                author_namespace(author_id),
+                profile_page_namespace(username),
+            )
+        ),
+    )
+
+
+def invalidate_feeds(user_ids):
+    generations.bump(*(feed_namespace(user_id) for user_id in user_ids))
+
+
+def invalidate_followers(author_id):
+    """Сбрасывает кэш лент всех подписчиков автора."""
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        generations.bump(CELEBRITIES_NAMESPACE)
+    else:
+        invalidate_feeds(followers)
@@ -0,0 +1,59 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Counters, Follow, Post, User
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя на delta."""
+    counters = Counters.objects.filter(user_id=user_id)
+    if not _change(counters, field, delta) and delta > 0:
+        Counters.objects.get_or_create(user_id=user_id)
+        _change(counters, field, delta)
+
+
+def change_post(post_id, delta):
+    """Атомарно меняет счётчик комментариев поста на delta."""
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def get_counters(user):
+    """Счётчики пользователя; для пользователя без строки — нули."""
+    try:
+        return user.counters
+    except Counters.DoesNotExist:
+        return Counters(user=user)
+
+
+def _count(queryset, field, outer):
+    return Coalesce(Subquery(
+        queryset.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild():
+    """Пересчитывает все счётчики по исходным таблицам."""
+    Counters.objects.bulk_create(
+        [
+            Counters(user_id=user_id)
+            for user_id in User.objects.filter(
+                counters__isnull=True
+            ).values_list('pk', flat=True)
+        ]
+    )
+    Counters.objects.update(
+        posts=_count(Post.objects.all(), 'author', 'user'),
+        followers=_count(Follow.objects.all(), 'author', 'user'),
+        following=_count(Follow.objects.all(), 'user', 'user'),
+    )
+    Post.objects.update(
+        comments_count=_count(Comment.objects.all(), 'post', 'pk')
+    )
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+
+from .cache import feed_generation
+from .counters import get_counters
+from .models import Counters, FeedEntry, Follow, Post
+
+PULLED_KEY = 'feed:pulled:{}'
+
+
+def _entries(user_ids, posts):
+    return [
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id in user_ids
+        for post_id, author_id, pub_date in posts
+    ]
+
+
+def _store(entries):
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def _latest_posts(posts):
+    return posts.order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'author', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+
+
+def celebrities(user):
+    """Авторы, на которых подписан user и которые не раскладываются."""
+    return Follow.objects.filter(
+        user=user,
+        author__counters__followers__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author', flat=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Посты авторов с числом подписчиков больше FEED_FANOUT_LIMIT не
+    раскладываются: подписчики забирают их сами при чтении ленты.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        return
+    _store(_entries(followers, [(post.pk, post.author_id, post.pub_date)]))
+
+
+def backfill(user, author):
+    """Добавляет в ленту последние посты нового автора."""
+    if get_counters(author).followers > settings.FEED_FANOUT_LIMIT:
+        return
+    _store(_entries([user.pk], _latest_posts(author.posts.all())))
+
+
+def trim(user, author):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(user=user, author=author).delete()
+
+
+def pull(user):
+    """Забирает в ленту новые посты популярных авторов.
+
+    Новых постов не бывает, пока не сменилось поколение ленты: его
+    сдвигают посты популярных авторов и подписки пользователя. Поэтому
+    после прошлого забора с тем же поколением база не трогается.
+    """
+    generation = feed_generation(user)
+    key = PULLED_KEY.format(user.pk)
+    if cache.get(key) == generation:
+        return
+    authors = list(celebrities(user))
+    if authors:
+        known = FeedEntry.objects.filter(
+            user=user, author__in=authors
+        ).values('post')
+        posts = Post.objects.filter(author__in=authors).exclude(pk__in=known)
+        _store(_entries([user.pk], _latest_posts(posts)))
+    cache.set(key, generation, settings.FOLLOW_CACHE_TIMEOUT)
+
+
+def entries_for(user):
+    """Материализованная лента пользователя, упорядочивается пагинатором."""
+    pull(user)
+    return FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def rebuild():
+    """Заново раскладывает все ленты по текущим подпискам.
+
+    Нужен после массовой вставки в обход сигналов; счётчики подписчиков
+    к этому моменту должны быть пересчитаны. Ленты собираются одним
+    INSERT ... SELECT, без загрузки строк в Python.
+    """
+    FeedEntry.objects.all().delete()
+    tables = {
+        'feed': FeedEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+        'counters': Counters._meta.db_table,
+    }
+    connection = connections[router.db_for_write(FeedEntry)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {feed} (user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            'FROM {follow} f '
+            'JOIN {counters} c ON c.user_id = f.author_id '
+            'JOIN ('
+            '  SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            '    PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            '  ) AS position FROM {post}'
+            ') p ON p.author_id = f.author_id '
+            'WHERE c.followers <= %s AND p.position <= %s'.format(**tables),
+            [settings.FEED_FANOUT_LIMIT, settings.FEED_BACKFILL_SIZE],
+        )
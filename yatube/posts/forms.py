@@ -1,12 +1,63 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
 from .models import Post, Comment
+from .uploads import OversizedUpload, image_size, normalize_image
+
+
+class PostImageField(forms.ImageField):
+    """Картинка с лимитом на размер файла и число пикселей.
+
+    Оба лимита проверяются до того, как Pillow начнёт декодировать
+    картинку: размер файла считает SizeLimitUploadHandler, а размеры
+    читаются из заголовка.
+    """
+
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': (
+            'Картинка %(width)s×%(height)s слишком большая, '
+            'допустимо не больше %(limit)s мегапикселей.'
+        ),
+    }
+
+    def to_python(self, data):
+        if isinstance(data, OversizedUpload):
+            raise forms.ValidationError(
+                self.error_messages['too_large'],
+                code='too_large',
+                params={
+                    'limit': filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+                },
+            )
+        if data is not None and hasattr(data, 'seek'):
+            try:
+                width, height = image_size(data)
+            except Exception:
+                # Нечитаемый заголовок разберёт forms.ImageField.
+                width = height = 0
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise forms.ValidationError(
+                    self.error_messages['too_many_pixels'],
+                    code='too_many_pixels',
+                    params={
+                        'width': width,
+                        'height': height,
+                        'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6,
+                    },
+                )
+        image = super().to_python(data)
+        if image is None:
+            return None
+        return normalize_image(image)
 
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'image', 'group')
+        field_classes = {'image': PostImageField}
 
 
 class CommentForm(forms.ModelForm):
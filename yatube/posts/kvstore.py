@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LRU:
+    """Ограниченный словарь, вытесняющий давно не читанные ключи."""
+
+    def __init__(self, size):
+        self.size = size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class KVStore(CachedKVStore):
+    """Хранилище sorl: LRU процесса, общий кэш, затем база.
+
+    В LRU попадают только найденные значения: миниатюра, которую другой
+    процесс достроит позже, не должна залипнуть в нём как отсутствующая.
+    По той же причине отсутствие хранится в общем кэше недолго.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lru = LRU(settings.THUMBNAIL_LRU_SIZE)
+
+    def get_many(self, image_files):
+        """Ищет все image_files разом; возвращает словарь key -> ImageFile."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = {}
+        for key in keys:
+            value = self.lru.get(key)
+            if value is not None:
+                values[key] = value
+        missing = [key for key in keys if key not in values]
+        if missing:
+            cached = self.cache.get_many(missing)
+            values.update(cached)
+            missing = [key for key in missing if key not in cached]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(
+                    key__in=missing
+                ).values_list('key', 'value')
+            )
+            self.cache.set_many(
+                stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            self.cache.set_many(
+                {key: EMPTY_VALUE for key in missing if key not in stored},
+                settings.THUMBNAIL_MISSING_CACHE_TIMEOUT,
+            )
+            values.update(stored)
+        found = {}
+        for key, value in values.items():
+            if value == EMPTY_VALUE:
+                continue
+            self.lru.set(key, value)
+            found[keys[key]] = deserialize_image_file(value)
+        return found
+
+    def clear(self, delete_thumbnails=False):
+        self.lru.clear()
+        super().clear(delete_thumbnails)
+
+    def _get_raw(self, key):
+        value = self.lru.get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self.lru.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self.lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        self.lru.delete(*keys)
+        super()._delete_raw(*keys)
@@ -0,0 +1,251 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.core.wsgi import get_wsgi_application
+from django.db import (
+    DEFAULT_DB_ALIAS, close_old_connections, connection, connections,
+    transaction,
+)
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Counters, Group, Post
+
+VIEWS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+
+
+def percentile(values, share):
+    """Значение, не меньше которого share всех values (ближайший ранг)."""
+    values = sorted(values)
+    return values[max(0, -(-len(values) * share // 100) - 1)]
+
+
+class TestClientTransport:
+    """Запросы через django.test.Client внутри процесса."""
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, method, url, data=None):
+        if method == 'POST':
+            return self.client.post(url, data).status_code
+        return self.client.get(url).status_code
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class LiveServerTransport:
+    """Запросы по HTTP к WSGI-серверу, запущенному в отдельном потоке.
+
+    Сервер работает на соединении с базой потока команды, чтобы записи
+    замера откатывались вместе с её транзакцией. Поэтому на время замера
+    соединения не закрываются в конце запросов, как и в тестовом клиенте.
+    """
+
+    def __init__(self, user):
+        self.database = connections[DEFAULT_DB_ALIAS]
+        self.database.inc_thread_sharing()
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        self.server = make_server(
+            'localhost', 0, get_wsgi_application(),
+            handler_class=QuietRequestHandler)
+        threading.Thread(target=self.serve, daemon=True).start()
+        client = Client()
+        client.force_login(user)
+        client.get(reverse('posts:create_post'))
+        self.csrf_token = client.cookies[settings.CSRF_COOKIE_NAME].value
+        self.headers = {
+            'Cookie': '; '.join(
+                f'{name}={client.cookies[name].value}'
+                for name in (
+                    settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME)
+            ),
+        }
+        self.connection = HTTPConnection(
+            'localhost', self.server.server_port)
+
+    def request(self, method, url, data=None):
+        headers = dict(self.headers)
+        body = None
+        if method == 'POST':
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.csrf_token
+        self.connection.request(method, url, body, headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def serve(self):
+        connections[DEFAULT_DB_ALIAS] = self.database
+        self.server.serve_forever()
+
+    def close(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+        self.database.dec_thread_sharing()
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет задержку (p50, p99) и пропускную способность основных '
+        'страниц и пишет результат в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сколько замеров делать для каждой страницы')
+        parser.add_argument(
+            '--warmup', type=int, default=20,
+            help='Сколько запросов сделать до замеров')
+        parser.add_argument(
+            '--views', nargs='+', choices=VIEWS, default=list(VIEWS),
+            help='Какие страницы замерять')
+        parser.add_argument(
+            '--live', action='store_true',
+            help='Ходить по HTTP в локальный WSGI-сервер, а не через '
+                 'тестовый клиент')
+        parser.add_argument(
+            '--output', help='Файл для JSON; по умолчанию stdout')
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона: сообщить о замедлениях')
+        parser.add_argument(
+            '--tolerance', type=float, default=20,
+            help='Допустимое замедление p50 и p99 в процентах')
+
+    def subjects(self):
+        """Самые нагруженные объекты базы: на них страницы тяжелее всего."""
+        reader = Counters.objects.order_by('-following').first()
+        author = Counters.objects.order_by('-posts').first()
+        group = Group.objects.annotate(
+            total=Count('group_posts')).order_by('-total').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if None in (reader, author, group, post):
+            raise CommandError(
+                'В базе нет данных, сначала запустите generate_data')
+        return reader.user, {
+            'index': ('GET', reverse('posts:index'), None),
+            'group_posts': (
+                'GET', reverse('posts:group_list', args=[group.slug]), None),
+            'profile': (
+                'GET',
+                reverse('posts:profile', args=[author.user.username]),
+                None,
+            ),
+            'post_detail': (
+                'GET', reverse('posts:post_detail', args=[post.pk]), None),
+            'follow_index': ('GET', reverse('posts:follow_index'), None),
+            'post_create': (
+                'POST', reverse('posts:create_post'),
+                {'text': 'Пост из замера производительности'},
+            ),
+            'add_comment': (
+                'POST', reverse('posts:add_comment', args=[post.pk]),
+                {'text': 'Комментарий из замера производительности'},
+            ),
+        }
+
+    def measure(self, transport, method, url, data, options):
+        if method == 'GET':
+            return self.run(transport, method, url, data, options)
+        # Записи откатываются, чтобы повторные прогоны шли на тех же данных.
+        with transaction.atomic():
+            result = self.run(transport, method, url, data, options)
+            transaction.set_rollback(True)
+        return result
+
+    def run(self, transport, method, url, data, options):
+        for _ in range(options['warmup']):
+            transport.request(method, url, data)
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            request_started = time.perf_counter()
+            status = transport.request(method, url, data)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            errors += status >= 400
+        elapsed = time.perf_counter() - started
+        return {
+            'url': url,
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+        }
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля')
+        user, subjects = self.subjects()
+        transport_class = (
+            LiveServerTransport if options['live'] else TestClientTransport
+        )
+        transport = transport_class(user)
+        try:
+            views = {
+                name: self.measure(transport, *subjects[name], options)
+                for name in options['views']
+            }
+        finally:
+            transport.close()
+        result = {
+            'started': datetime.now(timezone.utc).isoformat(),
+            'transport': 'live' if options['live'] else 'client',
+            'database': connection.vendor,
+            'posts': Post.objects.count(),
+            'views': views,
+        }
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+        if options['compare']:
+            self.compare(result, options['compare'], options['tolerance'])
+
+    def compare(self, result, path, tolerance):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['views']
+        regressions = []
+        for name, current in result['views'].items():
+            if name not in baseline:
+                continue
+            for metric in ('p50_ms', 'p99_ms'):
+                before = baseline[name][metric]
+                if current[metric] > before * (1 + tolerance / 100):
+                    regressions.append('{} {}: {} -> {}'.format(
+                        name, metric, before, current[metric]))
+        if regressions:
+            raise CommandError(
+                'Замедление больше {}%:\n{}'.format(
+                    tolerance, '\n'.join(regressions)))
+        self.stderr.write('Замедлений нет')
@@ -0,0 +1,110 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+
+from posts.models import Counters, FeedEntry, Group, Post
+from posts.utils import NEXT, KeysetPaginator, encode_cursor
+
+# Признаки плана, который не идёт по индексу в порядке выдачи.
+BAD_PLAN_MARKERS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE|SCAN (TABLE )?posts_\w+$', re.M),
+    'postgresql': re.compile(r'\bSort\b|Seq Scan on posts_'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает план и время первой и глубокой страницы '
+        'для каждого списка постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default',
+            help='Алиас базы данных')
+        parser.add_argument(
+            '--depth', type=int, default=1000,
+            help='Номер строки, с которой начинается глубокая страница')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнять каждый запрос')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Завершиться с ошибкой, если план не использует индекс')
+
+    def subjects(self, using):
+        posts = Post.objects.using(using)
+        author = Counters.objects.using(using).order_by('-posts').first()
+        follower = Counters.objects.using(using).order_by(
+            '-following').first()
+        group = Group.objects.using(using).annotate(
+            total=Count('group_posts')).order_by('-total').first()
+        post = posts.order_by('-comments_count').first()
+        subjects = {
+            'index': (
+                posts.select_related('author', 'group'),
+                ('-pub_date', '-pk'),
+            ),
+        }
+        if group is not None:
+            subjects['group_list'] = (
+                posts.filter(group=group).select_related('author', 'group'),
+                ('-pub_date', '-pk'),
+            )
+        if author is not None:
+            subjects['profile'] = (
+                posts.filter(author=author.user_id).select_related(
+                    'author', 'group'),
+                ('-pub_date', '-pk'),
+            )
+        if follower is not None:
+            subjects['follow_index'] = (
+                FeedEntry.objects.using(using).filter(
+                    user=follower.user_id
+                ).select_related('post__author', 'post__group'),
+                ('-pub_date', '-post_id'),
+            )
+        if post is not None:
+            subjects['post_detail'] = (
+                post.comments.using(using).select_related('author'),
+                ('created', 'pk'),
+            )
+        return subjects
+
+    def timed(self, queryset, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        using = options['database']
+        marker = BAD_PLAN_MARKERS.get(connections[using].vendor)
+        failed = []
+        for name, (queryset, ordering) in self.subjects(using).items():
+            paginator = KeysetPaginator(queryset, 10, ordering=ordering)
+            first_page = paginator.get_page()
+            deep_row = paginator.object_list[
+                options['depth']:options['depth'] + 1].first()
+            deep_page = first_page
+            if deep_row is not None:
+                deep_page = paginator.get_page(
+                    encode_cursor(NEXT, paginator.key_values(deep_row)))
+            plan = deep_page.queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            self.stdout.write(
+                'первая страница: {:.2f} мс, строка {}: {:.2f} мс\n'.format(
+                    self.timed(first_page.queryset, options['repeat']),
+                    options['depth'] if deep_row is not None else 0,
+                    self.timed(deep_page.queryset, options['repeat']),
+                )
+            )
+            if marker is not None and marker.search(plan):
+                failed.append(name)
+        if failed and options['check']:
+            raise CommandError(
+                'Без индекса выполняются: {}'.format(', '.join(failed)))
@@ -0,0 +1,192 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from posts import counters, feed, search
+from posts.models import Comment, Follow, Group, Post, User, render_text
+
+
+def power_law(values, alpha):
+    """Накопленные веса, при которых i-е значение выпадает ~ 1 / i**alpha."""
+    return list(accumulate(
+        1 / (rank + 1) ** alpha for rank in range(len(values))
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями, группами, постами, комментариями '
+        'и подписками для нагрузочных замеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона для авторов и подписок')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Сколько строк собирать в памяти на один bulk_create')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до запуска разбросать даты постов')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.alpha = options['alpha']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        # bulk_create не вызывает save(), поэтому HTML строится здесь.
+        self.texts = [
+            (text, render_text(text))
+            for text in (self.fake.text(300) for _ in range(1000))
+        ]
+        self.comment_texts = [
+            (text[:100], render_text(text[:100])) for text, _ in self.texts
+        ]
+        self.step('users', self.create_users, options['users'])
+        self.step('groups', self.create_groups, options['groups'])
+        self.step('posts', self.create_posts, options['posts'])
+        self.step('comments', self.create_comments, options['comments'])
+        self.step('follows', self.create_follows, options['follows'])
+        self.step('counters', counters.rebuild)
+        self.step('feeds', feed.rebuild)
+        self.step('search', search.rebuild)
+        cache.clear()
+
+    def step(self, name, function, *args):
+        started = time.perf_counter()
+        function(*args)
+        self.stdout.write('{}: {:.1f} с'.format(
+            name, time.perf_counter() - started))
+
+    def chunks(self, objects):
+        objects = iter(objects)
+        return iter(lambda: list(islice(objects, self.chunk_size)), [])
+
+    def bulk_create(self, model, objects, **kwargs):
+        """Вставляет objects порциями по chunk_size, не держа все в памяти."""
+        for chunk in self.chunks(objects):
+            model.objects.bulk_create(chunk, **kwargs)
+
+    def set_dates(self, model, field, dates):
+        """Проставляет даты, которые bulk_create затёр auto_now_add.
+
+        dates — пары (pk, дата). Иначе у всех строк почти одно время, и
+        сортировка по (дате, id) на деле идёт по id.
+        """
+        for chunk in self.chunks(dates):
+            model.objects.bulk_update(
+                [model(pk=pk, **{field: date}) for pk, date in chunk],
+                [field])
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def create_users(self, count):
+        first = User.objects.count()
+        password = make_password(None)
+        self.bulk_create(User, (
+            User(
+                username=f'user{first + i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for i in range(count)
+        ), ignore_conflicts=True)
+        self.users = list(User.objects.values_list('pk', flat=True))
+        self.random.shuffle(self.users)
+        self.user_weights = power_law(self.users, self.alpha)
+
+    def create_groups(self, count):
+        mixer = Mixer(commit=False)
+        first = Group.objects.count()
+        groups = mixer.cycle(count).blend(
+            Group, slug=(f'group-{first + i}' for i in range(count)))
+        self.bulk_create(Group, groups)
+        self.groups = list(Group.objects.values_list('pk', flat=True))
+
+    def authors(self, count):
+        return self.random.choices(
+            self.users, cum_weights=self.user_weights, k=count)
+
+    def create_posts(self, count):
+        groups = self.groups + [None] * max(1, len(self.groups) // 4)
+        authors = self.authors(count)
+        last = self.last_pk(Post)
+        self.bulk_create(Post, (
+            Post(
+                author_id=author_id,
+                group_id=self.random.choice(groups),
+                text=text,
+                text_html=text_html,
+            )
+            for author_id, (text, text_html) in zip(
+                authors, self.random.choices(self.texts, k=count))
+        ))
+        # Посты идут по времени в порядке id, как при обычной публикации.
+        new = Post.objects.filter(pk__gt=last).order_by('pk').values_list(
+            'pk', flat=True)
+        start = self.now - self.span
+        self.set_dates(Post, 'pub_date', zip(list(new), sorted(
+            start + self.span * self.random.random() for _ in range(count)
+        )))
+        self.posts = list(Post.objects.values_list('pk', flat=True))
+
+    def create_comments(self, count):
+        posts = self.random.choices(
+            self.posts, cum_weights=power_law(self.posts, self.alpha),
+            k=count)
+        last = self.last_pk(Comment)
+        self.bulk_create(Comment, (
+            Comment(
+                post_id=post_id,
+                author_id=self.random.choice(self.users),
+                text=text,
+                text_html=text_html,
+            )
+            for post_id, (text, text_html) in zip(
+                posts, self.random.choices(self.comment_texts, k=count))
+        ))
+        # Комментарий появляется между публикацией поста и запуском.
+        published = dict(Post.objects.values_list('pk', 'pub_date'))
+        self.set_dates(Comment, 'created', (
+            (pk, published[post_id] + (
+                self.now - published[post_id]) * self.random.random())
+            for pk, post_id in list(Comment.objects.filter(
+                pk__gt=last).values_list('pk', 'post_id'))
+        ))
+
+    def create_follows(self, count):
+        """Подписчики выбираются равномерно, авторы — по степенному закону.
+
+        Повторы и подписки на себя пропускаются, поэтому подписок может
+        получиться немного меньше count.
+        """
+        pairs = zip(
+            (self.random.choice(self.users) for _ in range(count)),
+            self.authors(count),
+        )
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+            if user_id != author_id
+        ), ignore_conflicts=True)
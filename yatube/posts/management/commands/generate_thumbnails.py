@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок всех постов'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image')
+        for post in posts.iterator():
+            thumbnails.build(post.image)
+        self.stdout.write(self.style.SUCCESS('Миниатюры построены'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import notifications
+
+
+class Command(BaseCommand):
+    help = 'Отправляет подписчикам созревшие сводки новых постов'
+
+    def handle(self, *args, **options):
+        sent = notifications.send_digests()
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
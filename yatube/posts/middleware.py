@@ -0,0 +1,72 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import page_generation
+
+PAGE_KEY = 'page:{}:{}'
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам страницы постов целиком из кэша.
+
+    Ключ — адрес с параметрами и поколение пространств страницы из
+    posts.cache.PAGE_NAMESPACES, так что запись поста или комментария
+    сбрасывает ровно свои страницы. Запросы с сессией или сообщениями
+    проходят мимо кэша, а ответы с куками, CSRF-токеном или
+    Cache-Control: private в него не попадают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.key(request)
+        if key is None:
+            return self.get_response(request)
+        response = cache.get(key)
+        if response is not None:
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')),
+                response=response,
+            )
+        response = self.get_response(request)
+        if self.cacheable(request, response):
+            cache.set(key, response, settings.FULL_PAGE_CACHE_TIMEOUT)
+        return response
+
+    def key(self, request):
+        if (
+            not settings.FULL_PAGE_CACHE_TIMEOUT
+            or request.method != 'GET'
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+            or CookieStorage.cookie_name in request.COOKIES
+        ):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        generation = page_generation(match.view_name, match.kwargs)
+        if generation is None:
+            return None
+        request.resolver_match = match
+        return PAGE_KEY.format(generation, hashlib.md5(
+            request.get_full_path().encode()).hexdigest())
+
+    def cacheable(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and 'private' not in response.get('Cache-Control', '')
+        )
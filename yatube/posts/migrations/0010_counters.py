@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count(queryset, field, outer):
+    return Coalesce(Subquery(
+        queryset.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Counters = apps.get_model('posts', 'Counters')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    db_alias = schema_editor.connection.alias
+    users = User.objects.using(db_alias).values_list('pk', flat=True)
+    Counters.objects.using(db_alias).bulk_create(
+        [Counters(user_id=pk) for pk in users]
+    )
+    Counters.objects.using(db_alias).update(
+        posts=count(Post.objects.all(), 'author', 'user'),
+        followers=count(Follow.objects.all(), 'author', 'user'),
+        following=count(Follow.objects.all(), 'user', 'user'),
+    )
+    Post.objects.using(db_alias).update(
+        comments_count=count(Comment.objects.all(), 'post', 'pk')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при добавлении и удалении комментариев', verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
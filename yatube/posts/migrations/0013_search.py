@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+from posts.stemmer import stems
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE posts_search ('
+            'rowid integer PRIMARY KEY '
+            'REFERENCES posts_post (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX posts_search_document_idx '
+            'ON posts_search USING GIN (document)'
+        )
+        schema_editor.execute(
+            'INSERT INTO posts_search (rowid, document) '
+            "SELECT id, to_tsvector('russian', text) FROM posts_post"
+        )
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        "document, tokenize='unicode61 remove_diacritics 2')"
+    )
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.using(connection.alias).values_list('pk', 'text')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, document) VALUES (%s, %s)',
+            [(pk, ' '.join(stems(text))) for pk, text in posts.iterator()],
+        )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='posts.Post')),
+                ('document', posts.models.SearchDocumentField()),
+            ],
+            options={
+                'db_table': 'posts_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:29
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+
+def fill_text_html(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    for model_name in ('Post', 'Comment'):
+        model = apps.get_model('posts', model_name)
+        objects = model.objects.using(db_alias)
+        batch = []
+        for obj in objects.only('pk', 'text').iterator():
+            obj.text_html = linebreaks(obj.text, autoescape=True)
+            batch.append(obj)
+            if len(batch) == 1000:
+                objects.bulk_update(batch, ['text_html'])
+                batch = []
+        objects.bulk_update(batch, ['text_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(default='', editable=False, help_text='Строится из текста при сохранении', verbose_name='Текст в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False, help_text='Строится из текста при сохранении', verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(fill_text_html, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,25 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from .storage import post_image_storage
 
 User = get_user_model()
+# Длина начала поста в заголовке страницы.
+SHORT_TEXT_LENGTH = 30
+
+
+def render_text(text):
+    """HTML текста так же, как фильтр linebreaks с экранированием."""
+    return linebreaks(text, autoescape=True)
+
+
+def with_text_html(update_fields):
+    """update_fields, дополненные text_html, если в них есть text."""
+    if update_fields is not None and 'text' in update_fields:
+        return {*update_fields, 'text_html'}
+    return update_fields
 
 
 class Group(models.Model):
@@ -30,6 +48,12 @@ class Post(models.Model):
         verbose_name='Текст',
         help_text='Введите текст поста'
     )
+    text_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='Текст в HTML',
+        help_text='Строится из текста при сохранении'
+    )
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата',
@@ -54,15 +78,49 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+        help_text='Обновляется при добавлении и удалении комментариев'
+    )
 
     class Meta:
         ordering = ('-pub_date', )
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def short_text(self):
+        """Начало текста для заголовка страницы."""
+        return Truncator(self.text[:SHORT_TEXT_LENGTH + 1]).chars(
+            SHORT_TEXT_LENGTH)
+
+    def save(self, *args, **kwargs):
+        """Строит text_html из текста.
+
+        Правки поста сохраняют только изменённые поля (update_fields),
+        чтобы не перезаписать comments_count устаревшим значением.
+        """
+        self.text_html = render_text(self.text)
+        kwargs['update_fields'] = with_text_html(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -83,12 +141,30 @@ class Comment(models.Model):
         verbose_name='Текст',
         help_text='Введите комментарий'
     )
+    text_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='Текст в HTML',
+        help_text='Строится из текста при сохранении'
+    )
     created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата',
         help_text='Автоматически добавляет текущее время'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.text_html = render_text(self.text)
+        kwargs['update_fields'] = with_text_html(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -101,6 +177,11 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
     )
+    notify = models.BooleanField(
+        default=False,
+        verbose_name='Уведомлять',
+        help_text='Присылать на почту сводку новых постов автора'
+    )
 
     class Meta:
         constraints = [
@@ -108,3 +189,142 @@ class Follow(models.Model):
                 fields=['user', 'author'],
                 name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'),
+        ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx')
+        ]
+
+
+class Notification(models.Model):
+    """Новый пост, ждущий отправки подписчику в почтовой сводке."""
+
+    user = models.ForeignKey(
+        User,
+        related_name='notifications',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_notification')
+        ]
+        indexes = [
+            models.Index(
+                fields=['created', 'user'],
+                name='notification_created_idx')
+        ]
+
+
+class Counters(models.Model):
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='counters',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    posts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов'
+    )
+    followers = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class SearchDocumentField(models.TextField):
+    """Документ полнотекстового индекса: столбец FTS5 или tsvector."""
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'tsvector'
+        return super().db_type(connection)
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    """document__match=query: запрос уже в синтаксисе движка базы."""
+
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return (
+            f"{lhs} @@ to_tsquery('russian', {rhs})",
+            lhs_params + rhs_params,
+        )
+
+
+class SearchEntry(models.Model):
+    """Строка поискового индекса постов.
+
+    Таблицу создаёт миграция под движок базы: виртуальную таблицу FTS5
+    в SQLite или таблицу с tsvector и GIN-индексом в PostgreSQL.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_entry',
+        on_delete=models.DO_NOTHING,
+    )
+    document = SearchDocumentField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_search'
@@ -0,0 +1,85 @@
+"""Почтовые сводки новых постов для подписчиков с включённым notify.
+
+Новый пост кладёт строку Notification каждому такому подписчику. Сводка
+уходит получателю, когда его самое старое уведомление ждёт дольше
+NOTIFY_DIGEST_WINDOW, и собирает все накопленные посты, так что частые
+посты одного автора дают одно письмо. Письма отправляются пачками по
+NOTIFY_BATCH_SIZE через одно соединение с почтовым сервером.
+"""
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Follow, Notification
+
+
+def queue(post):
+    """Ставит пост в сводки подписчиков автора, у которых есть почта."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id, notify=True
+    ).exclude(user__email='').values_list('user', flat=True)
+    Notification.objects.bulk_create(
+        (
+            Notification(user_id=user_id, post_id=post.pk)
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.NOTIFY_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def digest(user, posts):
+    """Письмо send_mass_mail со сводкой posts для user."""
+    context = {
+        'user': user,
+        'posts': posts,
+        'site_url': settings.SITE_URL,
+    }
+    return (
+        render_to_string('posts/email/digest_subject.txt', context).strip(),
+        render_to_string('posts/email/digest.txt', context),
+        None,
+        [user.email],
+    )
+
+
+def send_digests(now=None):
+    """Отправляет созревшие сводки и возвращает число писем."""
+    cutoff = (now or timezone.now()) - timedelta(
+        seconds=settings.NOTIFY_DIGEST_WINDOW)
+    recipients = list(
+        Notification.objects.filter(
+            created__lte=cutoff
+        ).order_by('user').values_list('user', flat=True).distinct()
+    )
+    size = settings.NOTIFY_BATCH_SIZE
+    sent = 0
+    with get_connection() as connection:
+        for start in range(0, len(recipients), size):
+            notifications = list(
+                Notification.objects.filter(
+                    user__in=recipients[start:start + size]
+                ).select_related('user', 'post__author').order_by(
+                    'user', 'post__pub_date', 'post'
+                )
+            )
+            messages = [
+                digest(user_notifications[0].user, [
+                    notification.post
+                    for notification in user_notifications
+                ])
+                for user_notifications in (
+                    list(group) for _, group in groupby(
+                        notifications, attrgetter('user_id'))
+                )
+            ]
+            sent += send_mass_mail(messages, connection=connection)
+            Notification.objects.filter(
+                pk__in=[notification.pk for notification in notifications]
+            ).delete()
+    return sent
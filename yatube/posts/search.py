@@ -0,0 +1,99 @@
+from itertools import islice
+
+from django.db import connections, router
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, SearchEntry
+from .stemmer import WORD_RE, stem, stems
+
+
+def index(post):
+    """Добавляет пост в поисковый индекс или обновляет его строку."""
+    connection = connections[router.db_for_write(SearchEntry)]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'INSERT INTO posts_search (rowid, document) '
+                "VALUES (%s, to_tsvector('russian', %s)) "
+                'ON CONFLICT (rowid) DO UPDATE '
+                'SET document = EXCLUDED.document',
+                [post.pk, post.text],
+            )
+        else:
+            cursor.execute(
+                'INSERT OR REPLACE INTO posts_search (rowid, document) '
+                'VALUES (%s, %s)',
+                [post.pk, ' '.join(stems(post.text))],
+            )
+
+
+def unindex(post_id):
+    SearchEntry.objects.filter(pk=post_id).delete()
+
+
+def rebuild(chunk_size=1000):
+    """Перестраивает индекс по всем постам, например после bulk_create."""
+    connection = connections[router.db_for_write(SearchEntry)]
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_search')
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'INSERT INTO posts_search (rowid, document) '
+                "SELECT id, to_tsvector('russian', text) FROM posts_post"
+            )
+            return
+        posts = Post.objects.using(connection.alias).values_list(
+            'pk', 'text').iterator()
+        for chunk in iter(lambda: list(islice(posts, chunk_size)), []):
+            cursor.executemany(
+                'INSERT INTO posts_search (rowid, document) '
+                'VALUES (%s, %s)',
+                [(pk, ' '.join(stems(text))) for pk, text in chunk],
+            )
+
+
+def search(text, using=None):
+    """Строки индекса, подходящие под text, с оценкой score.
+
+    Каждое слово запроса ищется как префикс основы, все слова
+    обязательны. Чем меньше score, тем выше пост в выдаче.
+    """
+    entries = SearchEntry.objects.all()
+    if using is not None:
+        entries = entries.using(using)
+    words = WORD_RE.findall(text)
+    if not words:
+        # score нужен пагинатору и у пустой выдачи.
+        return entries.none().annotate(
+            score=Value(0.0, output_field=FloatField()))
+    if connections[entries.db].vendor == 'postgresql':
+        query = ' & '.join(f'{word}:*' for word in words)
+        score = RawSQL(
+            "-ts_rank(posts_search.document, to_tsquery('russian', %s))",
+            [query],
+            output_field=FloatField(),
+        )
+    else:
+        query = ' '.join(f'"{stem(word)}"*' for word in words)
+        score = RawSQL('posts_search.rank', (), output_field=FloatField())
+    return entries.filter(document__match=query).annotate(score=score)
+
+
+def highlight(text, query):
+    """Экранированный text, в котором найденные слова обёрнуты в <mark>."""
+    terms = {stem(word) for word in WORD_RE.findall(query)}
+    parts = []
+    position = 0
+    for match in WORD_RE.finditer(text):
+        word = match.group()
+        parts.append(escape(text[position:match.start()]))
+        if any(stem(word).startswith(term) for term in terms):
+            parts.append(f'<mark>{escape(word)}</mark>')
+        else:
+            parts.append(escape(word))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
@@ -0,0 +1,175 @@
+import time
+
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import cache, counters, feed, tasks
+from .models import Comment, Counters, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        tasks.fan_out_post.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def notify_followers(sender, instance, created, **kwargs):
+    if created:
+        tasks.queue_notifications.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, update_fields=None, **kwargs):
+    if instance.image and (update_fields is None or 'image' in update_fields):
+        tasks.generate_thumbnails.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', '')
+    if previous and previous != instance.image.name:
+        transaction.on_commit(lambda: _release_image(previous))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: _release_image(name))
+
+
+def _release_image(name):
+    # Загрузка того же файла в этот момент уже могла найти его в
+    # хранилище, но ещё не сохранить свой пост: удаление откладывается.
+    tasks.release_image.schedule(
+        settings.POST_IMAGE_RELEASE_DELAY, name, time.time())
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        tasks.index_post.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    tasks.unindex_post.delay(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        tasks.backfill_feed.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    feed.trim(instance.user, instance.author)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group', 'image'
+            ).first() or (None, '')
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    cache.invalidate_post(
+        instance, getattr(instance, '_previous_group_id', None)
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = None
+    if instance.pk is not None:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    cache.invalidate_group(
+        instance, getattr(instance, '_previous_slug', None))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    cache.invalidate_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, created=False, **kwargs):
+    # Ленты с новым постом сбрасывает задача раскладки.
+    if not created:
+        tasks.invalidate_followers.delay(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    tasks.invalidate_post_followers.delay(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_feed(sender, instance, **kwargs):
+    cache.invalidate_feeds([instance.user_id])
+    cache.invalidate_follow(instance)
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, **kwargs):
+    if created:
+        Counters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'posts', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.user_id, 'following', 1)
+        counters.change_user(instance.author_id, 'followers', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, 'following', -1)
+    counters.change_user(instance.author_id, 'followers', -1)
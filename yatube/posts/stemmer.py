@@ -0,0 +1,133 @@
+"""Русский стеммер Snowball.
+
+Нужен поиску на SQLite: FTS5 не умеет русскую морфологию, поэтому в
+индекс и в запрос попадают уже обрезанные до основы слова.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+        'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую',
+        'юю', 'ая', 'яя', 'ою', 'ею',
+    ),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я',
+    ),
+)
+SUPERLATIVE = ((), ('ейше', 'ейш'))
+DERIVATIONAL = ((), ('ость', 'ост'))
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(word, start, endings):
+    """Отрезает самое длинное окончание из endings, лежащее в word[start:].
+
+    Окончания первой группы отрезаются, только если перед ними стоит
+    «а» или «я». Возвращает None, если ничего не отрезано.
+    """
+    with_a, plain = endings
+    best = max(
+        (
+            (len(ending), ending in with_a)
+            for ending in with_a + plain
+            if word.endswith(ending) and len(word) - len(ending) >= start
+        ),
+        default=None,
+    )
+    if best is None:
+        return None
+    length, needs_a = best
+    stem = word[:-length]
+    if needs_a and not (len(stem) > start and stem[-1] in 'ая'):
+        return None
+    return stem
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Основа одного слова."""
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+    # Шаг 1.
+    stemmed = _strip(word, rv, PERFECTIVE_GERUND)
+    if stemmed is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stemmed = _strip(word, rv, ADJECTIVE)
+        if stemmed is not None:
+            stemmed = _strip(stemmed, rv, PARTICIPLE) or stemmed
+        else:
+            stemmed = _strip(word, rv, VERB) or _strip(word, rv, NOUN)
+    word = stemmed or word
+    # Шаг 2.
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    # Шаг 3.
+    word = _strip(word, r2, DERIVATIONAL) or word
+    # Шаг 4.
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    stemmed = _strip(word, rv, SUPERLATIVE)
+    if stemmed is not None:
+        word = stemmed
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+        return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def stems(text):
+    """Основы всех слов текста в исходном порядке."""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,36 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы хранятся под sha256 содержимого.
+
+    Одинаковые загрузки получают одно имя и записываются на диск один
+    раз, а содержимое по имени никогда не меняется. Удалять файл можно
+    только тогда, когда на него не ссылается ни одна запись.
+    """
+
+    def hashed_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], digest[2:4], digest + extension
+        )
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        try:
+            # Повторная загрузка отмечает файл свежим, чтобы отложенное
+            # удаление (posts.thumbnails.release_image) его не тронуло.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super()._save(name, content)
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
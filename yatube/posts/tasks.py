@@ -0,0 +1,76 @@
+"""Побочные эффекты записи постов, выполняемые очередью core.tasks.
+
+Задачи получают id, а не объекты, и сами достают их из базы: к моменту
+выполнения объект может измениться или исчезнуть.
+"""
+from core.tasks import task
+
+from . import cache, feed, notifications, search, thumbnails
+from .models import Follow, Post
+
+
+@task
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    feed.fan_out(post)
+    cache.invalidate_followers(post.author_id)
+
+
+@task
+def queue_notifications(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        notifications.queue(post)
+
+
+@task
+def backfill_feed(follow_id):
+    follow = Follow.objects.select_related(
+        'user', 'author').filter(pk=follow_id).first()
+    if follow is None:
+        return
+    feed.backfill(follow.user, follow.author)
+    cache.invalidate_feeds([follow.user_id])
+
+
+@task(unique=True)
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        search.index(post)
+
+
+@task
+def unindex_post(post_id):
+    search.unindex(post_id)
+
+
+@task(unique=True)
+def generate_thumbnails(post_id):
+    """Строит миниатюры картинки поста и сбрасывает его страницы."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    thumbnails.build(post.image)
+    cache.invalidate_post(post)
+    cache.invalidate_followers(post.author_id)
+
+
+@task
+def release_image(name, released_at):
+    thumbnails.release_image(name, released_at)
+
+
+@task(unique=True)
+def invalidate_followers(author_id):
+    cache.invalidate_followers(author_id)
+
+
+@task(unique=True)
+def invalidate_post_followers(post_id):
+    author_id = Post.objects.filter(
+        pk=post_id).values_list('author', flat=True).first()
+    if author_id is not None:
+        cache.invalidate_followers(author_id)
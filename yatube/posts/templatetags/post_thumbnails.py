@@ -0,0 +1,18 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    """Готовая миниатюра картинки поста или None, пока она строится."""
+    return thumbnails.for_post(post, size)
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, size):
+    """Находит миниатюры всех постов страницы одним запросом."""
+    thumbnails.prefetch(posts, size)
+    return ''
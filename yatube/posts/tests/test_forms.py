@@ -1,11 +1,13 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Post, Comment
 
@@ -71,6 +73,51 @@ class FormsTest(TestCase):
         ))
         self.assertEqual(Post.objects.count(), posts_count + 1)
 
+    @override_settings(POST_IMAGE_MAX_BYTES=16)
+    def test_form_rejects_oversized_file(self):
+        """Файл больше лимита не сохраняется"""
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:create_post'),
+            data={'text': 'Тестовый текст', 'image': SimpleUploadedFile(
+                'small.gif', self.small_gif, 'image/gif')},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 16\xa0байт.')
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_form_rejects_too_many_pixels(self):
+        """Картинка с лишними пикселями отклоняется по заголовку"""
+        response = self.authorized_client.post(
+            reverse('posts:create_post'),
+            data={'text': 'Тестовый текст', 'image': SimpleUploadedFile(
+                'small.gif', self.small_gif, 'image/gif')},
+        )
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'too_many_pixels'))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_form_strips_exif_and_downscales(self):
+        """Большая картинка уменьшается, а EXIF из неё удаляется"""
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera'
+        content = BytesIO()
+        Image.new('RGB', (400, 200)).save(
+            content, 'JPEG', exif=exif.tobytes())
+        self.authorized_client.post(
+            reverse('posts:create_post'),
+            data={
+                'text': 'Пост с фотографией',
+                'image': SimpleUploadedFile(
+                    'photo.jpg', content.getvalue(), 'image/jpeg'),
+            },
+        )
+        post = Post.objects.get(text='Пост с фотографией')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
     def test_form_comment(self):
         """Форма comment работает правильно"""
         self.post = Post.objects.create(
@@ -1,7 +1,22 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
 
-from ..models import Group, Post
+from .. import thumbnails, views
+from ..models import Comment, Counters, Follow, Group, Post
 
 User = get_user_model()
 
@@ -96,3 +111,169 @@ class GroupModelTest(TestCase):
                 self.assertEqual(
                     task_group._meta.get_field(field).help_text,
                     expected_value)
+
+
+class TextHtmlTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_post_text_html(self):
+        """HTML текста строится при сохранении и правке поста"""
+        post = Post.objects.create(author=self.user, text='<b>Раз</b>\nДва')
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).text_html,
+            '<p>&lt;b&gt;Раз&lt;/b&gt;<br>Два</p>')
+        post.text = 'Три\n\nЧетыре'
+        post.save(update_fields=['text'])
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).text_html,
+            '<p>Три</p>\n\n<p>Четыре</p>')
+
+    def test_comment_text_html(self):
+        """HTML комментария строится при сохранении"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='a & b')
+        self.assertEqual(
+            Comment.objects.get(pk=comment.pk).text_html, '<p>a &amp; b</p>')
+
+    def test_short_text(self):
+        """Заголовок поста обрезается до 30 символов"""
+        self.assertEqual(Post(text='Короткий').short_text, 'Короткий')
+        self.assertEqual(Post(text='x' * 100).short_text, 'x' * 29 + '…')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_post_counter(self):
+        """Счётчик постов автора меняется при создании и удалении"""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertEqual(Counters.objects.get(user=self.author).posts, 1)
+        post.delete()
+        self.assertEqual(Counters.objects.get(user=self.author).posts, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев не затирается при правке поста"""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        # Страница правки загрузила пост до нового комментария.
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        client = Client()
+        client.force_login(self.author)
+        with mock.patch.object(
+            views, 'get_object_or_404', return_value=stale
+        ):
+            client.post(
+                reverse('posts:post_edit', args=[post.pk]),
+                {'text': 'Новый текст'},
+            )
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comments_count), ('Новый текст', 1))
+        post.comments.get().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок меняются при подписке"""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(Counters.objects.get(user=self.author).followers, 1)
+        self.assertEqual(Counters.objects.get(user=self.user).following, 1)
+        follow.delete()
+        self.assertEqual(Counters.objects.get(user=self.author).followers, 0)
+        self.assertEqual(Counters.objects.get(user=self.user).following, 0)
+
+    def test_rebuild_counters(self):
+        """rebuild_counters пересчитывает счётчики по таблицам"""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        Counters.objects.update(posts=0, followers=0, following=0)
+        Post.objects.update(comments_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        counters = Counters.objects.get(user=self.author)
+        self.assertEqual((counters.posts, counters.followers), (1, 1))
+        self.assertEqual(Counters.objects.get(user=self.user).following, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+    TASKS_EAGER=True,
+)
+class PostImageStorageTest(TransactionTestCase):
+    gif = (
+        b'\x47\x49\x46\x38\x39\x61\x02\x00'
+        b'\x01\x00\x80\x00\x00\x00\x00\x00'
+        b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+        b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+        b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+        b'\x0A\x00\x3B'
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=gif):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', content, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые картинки хранятся одним файлом под хешем"""
+        first = self.create_post()
+        second = self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)
+        ])
+
+    def test_image_is_deleted_with_last_reference(self):
+        """Картинка удаляется вместе с последним ссылающимся постом"""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(TASKS_EAGER=False)
+    def test_reuploaded_image_is_kept(self):
+        """Картинку, загруженную заново после отпускания, не удаляют"""
+        post = self.create_post()
+        path = post.image.path
+        released_at = time.time() - 50
+        os.utime(path, (released_at - 50, released_at - 50))
+        post.delete()
+        # Новая загрузка нашла файл, но её пост ещё не сохранён.
+        field = Post.image.field
+        field.storage.save(
+            field.generate_filename(post, 'small.gif'), ContentFile(self.gif))
+        thumbnails.release_image(post.image.name, released_at)
+        self.assertTrue(os.path.exists(path))
+        thumbnails.release_image(post.image.name, time.time() + 1)
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_is_deleted(self):
+        """Заменённая при редактировании картинка удаляется"""
+        post = self.create_post()
+        path = post.image.path
+        post.image = SimpleUploadedFile(
+            'other.gif', self.gif + b'\x00', 'image/gif')
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
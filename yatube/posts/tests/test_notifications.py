@@ -0,0 +1,111 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import RunOnCommitMixin
+
+from .. import notifications
+from ..models import Follow, Notification, Post, User
+
+LATER = timedelta(hours=2)
+
+
+@override_settings(NOTIFY_DIGEST_WINDOW=60 * 60, FULL_PAGE_CACHE_TIMEOUT=0)
+class NotificationTest(RunOnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{i}', email=f'reader{i}@example.com')
+            for i in range(5)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author, notify=True)
+        cls.silent = User.objects.create_user(
+            username='silent', email='silent@example.com')
+        Follow.objects.create(user=cls.silent, author=cls.author)
+        cls.no_email = User.objects.create_user(username='no_email')
+        Follow.objects.create(
+            user=cls.no_email, author=cls.author, notify=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def publish(self, count=1):
+        return [
+            Post.objects.create(author=self.author, text=f'Новый пост {i}')
+            for i in range(count)
+        ]
+
+    def test_only_opted_in_followers_queued(self):
+        """Уведомления получают только подписчики с notify и почтой"""
+        post, = self.publish()
+        self.assertEqual(
+            set(Notification.objects.filter(post=post).values_list(
+                'user', flat=True)),
+            {reader.pk for reader in self.readers},
+        )
+
+    def test_digest_waits_for_window(self):
+        """Сводка не уходит, пока уведомление не прождало окно"""
+        self.publish()
+        self.assertEqual(notifications.send_digests(), 0)
+        self.assertEqual(mail.outbox, [])
+        sent = notifications.send_digests(timezone.now() + LATER)
+        self.assertEqual(sent, len(self.readers))
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(reader.email for reader in self.readers),
+        )
+        self.assertFalse(Notification.objects.exists())
+
+    def test_posts_coalesced_per_recipient(self):
+        """Несколько постов попадают в одно письмо получателю"""
+        posts = self.publish(3)
+        notifications.send_digests(timezone.now() + LATER)
+        self.assertEqual(len(mail.outbox), len(self.readers))
+        message = mail.outbox[0]
+        self.assertIn('3', message.subject)
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertIn(
+                    reverse('posts:post_detail', args=[post.pk]),
+                    message.body)
+
+    @override_settings(NOTIFY_BATCH_SIZE=2)
+    def test_batches_share_connection(self):
+        """Пачки писем отправляются через одно соединение"""
+        self.publish()
+        with mock.patch.object(
+            notifications, 'get_connection',
+            wraps=notifications.get_connection,
+        ) as get_connection:
+            call_command('send_digests', stdout=StringIO())
+            notifications.send_digests(timezone.now() + LATER)
+        self.assertEqual(get_connection.call_count, 2)
+        self.assertEqual(len(mail.outbox), len(self.readers))
+
+    def test_notify_toggle(self):
+        """Подписчик включает и выключает письма на странице автора"""
+        reader = self.silent
+        self.client.force_login(reader)
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(
+            self.client.get(profile), 'Присылать новые посты на почту')
+        self.client.get(
+            reverse('posts:profile_notify', args=[self.author.username]))
+        follow = Follow.objects.get(user=reader, author=self.author)
+        self.assertTrue(follow.notify)
+        self.assertContains(self.client.get(profile), 'Не присылать письма')
+        self.client.get(
+            reverse('posts:profile_mute', args=[self.author.username]))
+        follow.refresh_from_db()
+        self.assertFalse(follow.notify)
@@ -0,0 +1,198 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+
+from .. import counters, feed
+from ..models import (
+    Comment, Counters, FeedEntry, Follow, Group, Post, SearchEntry,
+)
+
+User = get_user_model()
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+# Размеры данных, на которых проверяются бюджеты. Прогон на 100k постов
+# долгий, поэтому включается явно: QUERY_BUDGET_SIZES=10,1000,100000.
+SIZES = [
+    int(size)
+    for size in os.environ.get('QUERY_BUDGET_SIZES', '10,1000').split(',')
+]
+# Наибольшее число запросов на страницу для авторизованного пользователя
+# при выключенном кэше: сессия, пользователь, данные страницы.
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_list': 4,
+    'posts:profile': 5,
+    'posts:post_detail': 4,
+    'posts:follow_index': 4,
+}
+
+
+class QueryBudgetMixin:
+    """Проверка того, что страница укладывается в бюджет запросов."""
+
+    budgets = QUERY_BUDGETS
+
+    def assertQueryBudget(self, client, view_name, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        budget = self.budgets[view_name]
+        if len(queries) > budget:
+            self.fail(
+                '{} выполнил {} запросов при бюджете {}:\n{}'.format(
+                    view_name,
+                    len(queries),
+                    budget,
+                    '\n'.join(query['sql'] for query in queries),
+                )
+            )
+        return len(queries)
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = Faker('ru_RU')
+        cls.user = mixer.blend(User)
+        cls.authors = mixer.cycle(5).blend(User)
+        cls.groups = mixer.cycle(3).blend(Group)
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.user, author=author)
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def grow(self, size):
+        """Догружает посты до size штук одним bulk_create."""
+        missing = size - Post.objects.count()
+        Post.objects.bulk_create(
+            [
+                Post(
+                    text=self.fake.text(200),
+                    author=self.authors[i % len(self.authors)],
+                    group=self.groups[i % len(self.groups)],
+                )
+                for i in range(missing)
+            ]
+        )
+        post = Post.objects.filter(author=self.authors[0]).first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text=self.fake.text(50))
+            for author in self.authors
+        )
+        for author in self.authors[:3]:
+            feed.backfill(self.user, author)
+        counters.rebuild()
+        return post
+
+    def urls(self, post):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.groups[0].slug}),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.authors[0]}),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def test_views_fit_query_budgets(self):
+        """Страницы укладываются в бюджет запросов на любом объёме данных"""
+        measured = {}
+        for size in SIZES:
+            post = self.grow(size)
+            for view_name, url in self.urls(post).items():
+                with self.subTest(view_name=view_name, size=size):
+                    count = self.assertQueryBudget(
+                        self.authorized_client, view_name, url)
+                    self.assertEqual(
+                        measured.setdefault(view_name, count), count,
+                        f'{view_name}: число запросов растёт с данными')
+
+
+class ListViewPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = mixer.blend(User)
+        author = mixer.blend(User)
+        group = mixer.blend(Group)
+        Follow.objects.create(user=user, author=author)
+        for i in range(30):
+            post = Post.objects.create(
+                text=f'Тестовый пост {i}', author=author, group=group)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+
+    def test_list_views_use_indexes(self):
+        """Страницы списков читаются по индексу без сортировки"""
+        output = StringIO()
+        call_command(
+            'explain_list_views', '--check', '--depth=15', '--repeat=1',
+            stdout=output)
+        for name in ('index', 'group_list', 'profile', 'follow_index',
+                     'post_detail'):
+            with self.subTest(name=name):
+                self.assertIn(name, output.getvalue())
+
+
+class LoadTestCommandsTest(TestCase):
+    def test_generate_data_keeps_derived_tables_consistent(self):
+        """generate_data заполняет счётчики, ленты и поисковый индекс"""
+        call_command(
+            'generate_data', '--users=20', '--groups=3', '--posts=200',
+            '--comments=100', '--follows=60', '--seed=1', stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(SearchEntry.objects.count(), 200)
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertEqual(len(set(dates)), 200)
+        self.assertGreater(max(dates) - min(dates), timedelta(days=30))
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+        reader = Follow.objects.first().user
+        self.assertEqual(
+            Counters.objects.get(user=reader).following,
+            Follow.objects.filter(user=reader).count())
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=reader).values_list('post_id', flat=True)),
+            set(Post.objects.filter(
+                author__following__user=reader).values_list('pk', flat=True)))
+
+    def test_benchmark_reports_every_view(self):
+        """benchmark замеряет все страницы и откатывает свои записи"""
+        call_command(
+            'generate_data', '--users=5', '--groups=1', '--posts=20',
+            '--comments=5', '--follows=10', '--seed=1', stdout=StringIO())
+        counts = Post.objects.count(), Comment.objects.count()
+        for live in ([], ['--live']):
+            with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+                call_command(
+                    'benchmark', '--requests=2', '--warmup=0', *live,
+                    f'--output={output.name}', stderr=StringIO())
+                result = json.load(output)
+            for name, view in result['views'].items():
+                with self.subTest(name=name, live=live):
+                    self.assertEqual(view['errors'], 0)
+                    self.assertLessEqual(view['p50_ms'], view['p99_ms'])
+                    self.assertGreater(view['throughput_rps'], 0)
+            self.assertEqual(
+                (Post.objects.count(), Comment.objects.count()), counts)
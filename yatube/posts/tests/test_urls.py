@@ -35,6 +35,7 @@ class StaticURLTests(TestCase):
             '/posts/{}/'.format(self.post.pk): 'posts/post_detail.html',
             '/posts/{}/edit/'.format(self.post.pk): 'posts/create_post.html',
             '/create/': 'posts/create_post.html',
+            '/search/?q=пост': 'posts/search.html',
 
         }
         for address, template in templates_url_names.items():
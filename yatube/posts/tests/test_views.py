@@ -1,15 +1,24 @@
 import shutil
 import tempfile
+import warnings
 
 from django import forms
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
 
-from ..models import Group, Post, Follow
+from core.testing import RunOnCommitMixin
+
+from .. import feed, search, thumbnails
+from ..models import Comment, FeedEntry, Group, Post, Follow
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -158,8 +167,101 @@ class PagesTest(TestCase):
                 self.assertIsInstance(form_field, expected)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, CACHES=TEMP_CACHES)
+class ThumbnailTest(RunOnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Миниатюры, построенные в других тестах, остались в LRU процесса,
+        # хотя их строки в базе откатились, а отметки об отсутствии — в
+        # общем кэше.
+        default.kvstore.lru.clear()
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', self.gif, 'image/gif'),
+        )
+
+    @override_settings(TASKS_EAGER=True)
+    def test_thumbnails_are_built_on_save(self):
+        """Миниатюры всех размеров строятся при сохранении поста"""
+        post = self.create_post()
+        for size in settings.POST_THUMBNAIL_SIZES:
+            with self.subTest(size=size):
+                self.assertIsNotNone(thumbnails.stored(post.image, size))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, thumbnails.stored(post.image, 'list').url)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_thumbnail_has_responsive_variants(self):
+        """Миниатюра строится в нескольких ширинах и форматах"""
+        post = self.create_post()
+        picture = thumbnails.stored(post.image, 'list')
+        widths = settings.POST_THUMBNAIL_SIZES['list']['widths']
+        self.assertEqual(picture.width, max(widths))
+        for width in widths:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', picture.srcset)
+        self.assertEqual(
+            [source['type'] for source in picture.sources],
+            [Image.MIME[name] for name in thumbnails.formats()[:-1]],
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, picture.srcset)
+        for source in picture.sources:
+            with self.subTest(type=source['type']):
+                self.assertContains(response, source['srcset'])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_page_thumbnails_are_prefetched_at_once(self):
+        """Миниатюры страницы ищутся одним запросом, затем берутся из LRU"""
+        posts = [self.create_post() for _ in range(3)]
+        default.kvstore.lru.clear()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts, 'list')
+        self.assertEqual(len(queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts, 'list')
+        self.assertEqual(len(queries), 0)
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertEqual(
+                    thumbnails.for_post(post, 'list').srcset,
+                    thumbnails.stored(post.image, 'list').srcset)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_pending_thumbnail_shows_placeholder(self):
+        """Пока миниатюра не готова, вместо неё показывается заглушка"""
+        post = self.create_post()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertIsNone(thumbnails.stored(post.image, 'detail'))
+        self.assertContains(response, 'Изображение обрабатывается')
+
+
 @override_settings(CACHES=TEMP_CACHES)
-class CacheTest(TestCase):
+class CacheTest(RunOnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -182,9 +284,64 @@ class CacheTest(TestCase):
         new_posts = response.content
         self.assertEqual(old_posts, new_posts)
 
+    def test_index_cache_invalidated_by_new_post(self):
+        """Новый пост сразу появляется на закэшированной главной"""
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:create_post'), {'text': 'Свежий пост'})
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_group_cache_invalidated_by_edit(self):
+        """Перенос поста сбрасывает кэш страницы прежней группы"""
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        post = Post.objects.create(
+            author=self.user, text='Пост в группе', group=group)
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        self.assertContains(self.authorized_client.get(url), 'Пост в группе')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост без группы'})
+        self.assertNotContains(self.authorized_client.get(url), 'Пост')
+
+    def test_profile_cache_invalidated_by_edit(self):
+        """Правка поста сразу видна в закэшированном профиле"""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Новый текст'})
+        self.assertContains(self.authorized_client.get(url), 'Новый текст')
+
+    def test_follow_cache_is_per_user(self):
+        """Кэш ленты подписок у каждого пользователя свой"""
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        Follow.objects.create(user=self.user, author=author)
+        Post.objects.create(author=author, text='Пост автора')
+        self.authorized_client.get(reverse('posts:follow_index'))
+        response = reader_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Пост автора')
+
+    def test_follow_cache_invalidated_by_new_post(self):
+        """Новый пост сразу появляется в кэшированной ленте"""
+        author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=self.user, author=author)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        Post.objects.create(author=author, text='Свежий пост')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Свежий пост')
+
 
 @override_settings(CACHES=TEMP_CACHES)
-class FollowTest(TestCase):
+class FollowTest(RunOnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -193,6 +350,9 @@ class FollowTest(TestCase):
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
 
+    def setUp(self):
+        cache.clear()
+
     def test_follow(self):
         """Подписка работает корректно"""
         follow_count = Follow.objects.count()
@@ -241,8 +401,57 @@ class FollowTest(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertNotEqual(old_response.content, response.content)
 
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists())
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты"""
+        Post.objects.create(author=self.author, text='Тестовый пост')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.user).exists())
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Посты популярных авторов забираются в ленту при чтении"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_pull_skipped_until_feed_changes(self):
+        """Повторное чтение ленты без новых постов не ходит в базу"""
+        Follow.objects.create(user=self.user, author=self.author)
+        feed.pull(self.user)
+        with self.assertNumQueries(0):
+            feed.pull(self.user)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        feed.pull(self.user)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists())
+
+    def test_follow_feed_second_page(self):
+        """Лента подписок листается курсором"""
+        Follow.objects.create(user=self.user, author=self.author)
+        for i in range(settings.PAGINATOR_POSTS_PER_PAGE + 1):
+            Post.objects.create(author=self.author, text=f'Тестовый пост {i}')
+        url = reverse('posts:follow_index')
+        page_obj = self.authorized_client.get(url).context['page_obj']
+        response = self.authorized_client.get(
+            url, {'cursor': page_obj.next_cursor})
+        self.assertEqual(response.context['page_obj'][0].text,
+                         'Тестовый пост 0')
+
 
 @override_settings(CACHES=TEMP_CACHES)
+@override_settings(FULL_PAGE_CACHE_TIMEOUT=0)
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -263,6 +472,12 @@ class PaginatorViewsTest(TestCase):
             ) for i in range(count_test_posts)
         ])
 
+    def get_second_page(self, url):
+        response = self.client.get(url)
+        return self.client.get(
+            url, {'cursor': response.context['page_obj'].next_cursor}
+        )
+
     def test_first_page_contains_ten_records_index(self):
         """Paginator в index корректно отображает первую страницу"""
         response = self.client.get(reverse('posts:index'))
@@ -271,7 +486,7 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_page_contains_three_records_index(self):
         """Paginator в index корректно отображает вторую страницу"""
-        response = self.client.get(reverse('posts:index') + '?page=2')
+        response = self.get_second_page(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), self.second_page)
 
     def test_first_page_contains_ten_records_group_list(self):
@@ -283,9 +498,8 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_page_contains_three_records_group_list(self):
         """Paginator в group_list корректно отображает вторую страницу"""
-        response = self.client.get(
-            reverse('posts:group_list', kwargs={'slug': self.group.slug})
-            + '?page=2')
+        response = self.get_second_page(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
         self.assertEqual(len(response.context['page_obj']), self.second_page)
 
     def test_first_page_contains_ten_records_profile(self):
@@ -297,7 +511,324 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_page_contains_three_records_profile(self):
         """Paginator в profile корректно отображает вторую страницу"""
-        response = self.client.get(
-            reverse('posts:profile', kwargs={'username': self.user.username})
-            + '?page=2')
+        response = self.get_second_page(
+            reverse('posts:profile', kwargs={'username': self.user.username}))
         self.assertEqual(len(response.context['page_obj']), self.second_page)
+
+    def test_previous_cursor_returns_first_page(self):
+        """Курсор «назад» возвращает на первую страницу"""
+        url = reverse('posts:index')
+        first_page = list(self.client.get(url).context['page_obj'])
+        page_obj = self.get_second_page(url).context['page_obj']
+        self.assertTrue(page_obj.has_previous())
+        self.assertFalse(page_obj.has_next())
+        response = self.client.get(
+            url, {'cursor': page_obj.previous_cursor})
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_last_cursor_returns_last_page(self):
+        """Курсор последней страницы заканчивается самым старым постом"""
+        url = reverse('posts:index')
+        page_obj = self.client.get(url).context['page_obj']
+        response = self.client.get(
+            url, {'cursor': page_obj.paginator.last_cursor})
+        last_page = response.context['page_obj']
+        self.assertEqual(len(last_page), settings.PAGINATOR_POSTS_PER_PAGE)
+        self.assertEqual(last_page[len(last_page) - 1].text,
+                         self.posts[0].text)
+        self.assertFalse(last_page.has_next())
+        self.assertTrue(last_page.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор показывает первую страницу"""
+        response = self.client.get(reverse('posts:index'), {'cursor': 'abc'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.PAGINATOR_POSTS_PER_PAGE)
+
+    @override_settings(PAGINATOR_COUNT_LIMIT=5)
+    def test_profile_count_is_bounded(self):
+        """Число постов в профиле ограничено PAGINATOR_COUNT_LIMIT"""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username}))
+        paginator = response.context['page_obj'].paginator
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_is_exact)
+
+
+@override_settings(CACHES=TEMP_CACHES)
+class SearchTest(RunOnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки сидят на окне')
+        cls.cat = Post.objects.create(
+            author=cls.user, text='Кошка смотрит на кошку <b>')
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака лает на кошачьих')
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, [post.pk for post in response.context['page_obj']]
+
+    def test_search_matches_word_forms_by_rank(self):
+        """Поиск находит другие формы слова, сначала самые подходящие"""
+        response, found = self.search('кошками')
+        self.assertEqual(found, [self.cat.pk, self.cats.pk])
+
+    def test_search_requires_all_words(self):
+        """Все слова запроса обязательны"""
+        response, found = self.search('кошки окна')
+        self.assertEqual(found, [self.cats.pk])
+
+    def test_search_highlights_matches(self):
+        """Найденные слова выделяются, остальной текст экранируется"""
+        response, found = self.search('кошка')
+        self.assertContains(
+            response,
+            '<mark>Кошка</mark> смотрит на <mark>кошку</mark> &lt;b&gt;',
+        )
+
+    def test_search_without_words(self):
+        """Пустой запрос или одни знаки препинания дают пустую выдачу"""
+        for query in ('', '   ', '!!!', '"'):
+            with self.subTest(query=query):
+                response, found = self.search(query)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(found, [])
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.dog.text = 'Собака спит'
+        self.dog.save()
+        self.assertEqual(self.search('спит')[1], [self.dog.pk])
+        self.assertEqual(self.search('лает')[1], [])
+        self.dog.delete()
+        self.assertEqual(self.search('собака')[1], [])
+
+    def test_search_second_page(self):
+        """Выдача листается курсором вместе с запросом"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кошка номер {i}') for i in range(9)
+        )
+        for post in Post.objects.filter(text__startswith='Кошка номер'):
+            search.index(post)
+        response, first = self.search('кошка')
+        self.assertEqual(len(first), settings.PAGINATOR_POSTS_PER_PAGE)
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0&amp;')
+        response, second = self.search('кошка', cursor=cursor)
+        self.assertEqual(len(second), 11 - settings.PAGINATOR_POSTS_PER_PAGE)
+        self.assertFalse(set(first) & set(second))
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через тот же индекс"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошками'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.cat.pk, self.cats.pk},
+        )
+
+
+@override_settings(CACHES=TEMP_CACHES)
+class PostDetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    def add_comments(self, count):
+        start = self.post.comments.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'commentator{i}')
+            Comment.objects.create(
+                post=self.post, author=author, text=f'Комментарий {i}')
+
+    def test_post_detail_query_count_is_fixed(self):
+        """Число запросов post_detail не зависит от числа комментариев"""
+        self.add_comments(1)
+        with CaptureQueriesContext(connection) as one_comment:
+            self.authorized_client.get(self.url)
+        self.add_comments(20)
+        with self.assertNumQueries(len(one_comment)):
+            self.authorized_client.get(self.url)
+
+    @override_settings(PAGINATOR_COMMENTS_PER_PAGE=5)
+    def test_post_detail_comments_are_paginated(self):
+        """Комментарии в post_detail выводятся постранично"""
+        self.add_comments(7)
+        response = self.authorized_client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in range(5)])
+        response = self.authorized_client.get(
+            self.url, {'cursor': comments.next_cursor})
+        self.assertEqual(len(response.context['comments']), 2)
+
+
+class ConditionalResponseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_anonymous_pages_are_shared(self):
+        """Страницы анонимов можно хранить в общем кэше"""
+        urls = {
+            reverse('posts:index'): 60,
+            reverse('posts:group_list', args=[self.group.slug]): 60,
+            reverse('posts:profile', args=[self.author.username]): 60,
+            reverse('posts:post_detail', args=[self.post.pk]): 30,
+        }
+        for url, s_maxage in urls.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn(f's-maxage={s_maxage}',
+                              response['Cache-Control'])
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_user_pages_are_private(self):
+        """Страницы пользователя не попадают в общий кэш"""
+        url = reverse('posts:index')
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(
+            response['ETag'], self.guest_client.get(url)['ETag'])
+
+    def test_last_modified(self):
+        """Главная отвечает 304 на If-Modified-Since"""
+        url = reverse('posts:index')
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_update_etag(self):
+        """Новый пост, комментарий, его правка и подписка меняют ETag"""
+        index_url = reverse('posts:index')
+        detail_url = reverse('posts:post_detail', args=[self.post.pk])
+        profile_url = reverse('posts:profile', args=[self.author.username])
+        changes = (
+            (index_url, lambda: Post.objects.create(
+                author=self.author, text='Новый пост')),
+            (detail_url, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий')),
+            (detail_url, lambda: Comment.objects.filter(
+                post=self.post).first().save()),
+            (profile_url, lambda: Follow.objects.create(
+                user=self.reader, author=self.author)),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост')
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[cls.group.slug]),
+            'profile': reverse('posts:profile', args=[cls.author.username]),
+            'detail': reverse('posts:post_detail', args=[cls.post.pk]),
+            'other_group': reverse(
+                'posts:group_list', args=[cls.other_group.slug]),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        for url in self.urls.values():
+            self.guest_client.get(url)
+
+    def test_pages_served_without_queries(self):
+        """Повторный запрос анонима не доходит до базы"""
+        for url in self.urls.values():
+            with self.subTest(url=url), self.assertNumQueries(0):
+                self.assertEqual(self.guest_client.get(url).status_code, 200)
+
+    def test_post_purges_its_pages_only(self):
+        """Новый пост сбрасывает только страницы, где он виден"""
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        for name in ('index', 'group', 'profile'):
+            with self.subTest(page=name):
+                self.assertContains(
+                    self.guest_client.get(self.urls[name]), 'Свежий пост')
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.urls['other_group'])
+
+    def test_comment_purges_post_detail(self):
+        """Комментарий сразу виден на закэшированной странице поста"""
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий комментарий')
+        self.assertContains(
+            self.guest_client.get(self.urls['detail']), 'Свежий комментарий')
+
+    def test_address_not_in_cache_keys(self):
+        """Имя и slug из адреса не портят ключи кэша"""
+        for url in (
+            reverse('posts:profile', args=['Тестовый адрес']),
+            reverse('posts:group_list', args=['x' * 250]),
+        ):
+            with self.subTest(url=url), warnings.catch_warnings():
+                warnings.simplefilter('error', CacheKeyWarning)
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    def test_session_bypasses_cache(self):
+        """Запросы с сессией не получают страницы анонимов"""
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(self.urls['index'])
+        self.assertContains(response, 'Новая запись')
+        self.assertIsNotNone(response.context)
@@ -0,0 +1,190 @@
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import router
+from PIL import Image
+from sorl.thumbnail import base, default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+Variant = namedtuple('Variant', 'format width geometry options')
+
+
+def _options(source, options):
+    """Дополняет options так же, как ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl, который знает расширения всех форматов Pillow."""
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = '%s/%s/%s' % (key[:2], key[2:4], key)
+        extension = base.EXTENSIONS.get(
+            options['format'], options['format'].lower())
+        return '%s%s.%s' % (sorl_settings.THUMBNAIL_PREFIX, path, extension)
+
+
+@lru_cache(maxsize=None)
+def formats():
+    """Форматы из POST_THUMBNAIL_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return tuple(
+        image_format
+        for image_format in settings.POST_THUMBNAIL_FORMATS
+        if image_format in Image.SAVE
+    )
+
+
+def variants(size):
+    """Все варианты миниатюры size: каждая ширина в каждом формате."""
+    config = settings.POST_THUMBNAIL_SIZES[size]
+    width, height = map(int, config['geometry'].split('x'))
+    return [
+        Variant(
+            image_format,
+            variant_width,
+            '{}x{}'.format(variant_width, variant_width * height // width),
+            dict(config['options'], format=image_format),
+        )
+        for image_format in formats()
+        for variant_width in config['widths']
+    ]
+
+
+def variant_file(image, variant):
+    """ImageFile, под которым sorl хранит вариант миниатюры image."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, variant.geometry, _options(source, variant.options))
+    return ImageFile(name, default.storage)
+
+
+class Picture:
+    """Готовые варианты миниатюры для разметки <picture> и srcset.
+
+    Последний формат в POST_THUMBNAIL_FORMATS считается запасным: его
+    самая широкая миниатюра идёт в src, и без неё картинка не готова.
+    """
+
+    def __init__(self, size, found):
+        self.sizes = settings.POST_THUMBNAIL_SIZES[size]['sizes']
+        by_format = {}
+        for variant, thumbnail in found:
+            by_format.setdefault(variant.format, []).append(thumbnail)
+        fallback = by_format.pop(formats()[-1])
+        self.fallback = fallback[-1]
+        self.url = self.fallback.url
+        self.width = self.fallback.width
+        self.height = self.fallback.height
+        self.srcset = self._srcset(fallback)
+        self.sources = [
+            {'type': Image.MIME[image_format], 'srcset': self._srcset(files)}
+            for image_format, files in by_format.items()
+        ]
+
+    @staticmethod
+    def _srcset(files):
+        return ', '.join(
+            '{} {}w'.format(thumbnail.url, thumbnail.width)
+            for thumbnail in files
+        )
+
+
+def _pictures(images, size):
+    """Picture для каждой картинки или None, если она ещё не готова."""
+    files = [
+        [(variant, variant_file(image, variant)) for variant in variants(size)]
+        for image in images
+    ]
+    found = default.kvstore.get_many(
+        thumbnail for image_files in files for _, thumbnail in image_files)
+    pictures = []
+    for image_files in files:
+        variant, fallback = image_files[-1]
+        if fallback.key not in found:
+            pictures.append(None)
+            continue
+        pictures.append(Picture(size, [
+            (variant, found[thumbnail.key])
+            for variant, thumbnail in image_files
+            if thumbnail.key in found
+        ]))
+    return pictures
+
+
+def stored(image, size):
+    """Picture с готовыми миниатюрами image размера size или None.
+
+    Только смотрит в хранилище ключей sorl и никогда не трогает
+    исходный файл.
+    """
+    if not image:
+        return None
+    return _pictures([image], size)[0]
+
+
+def prefetch(posts, size):
+    """Находит миниатюры всех posts одним обращением к хранилищу."""
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return
+    pictures = _pictures([post.image for post in posts], size)
+    for post, picture in zip(posts, pictures):
+        if not hasattr(post, '_thumbnails'):
+            post._thumbnails = {}
+        post._thumbnails[size] = picture
+
+
+def for_post(post, size):
+    """Миниатюра поста: из prefetch, если он был, иначе из хранилища."""
+    prefetched = getattr(post, '_thumbnails', {})
+    if size in prefetched:
+        return prefetched[size]
+    return stored(post.image, size)
+
+
+def build(image):
+    """Строит все варианты миниатюр image всех настроенных размеров."""
+    for size in settings.POST_THUMBNAIL_SIZES:
+        for variant in variants(size):
+            get_thumbnail(image, variant.geometry, **variant.options)
+
+
+def release_image(name, released_at):
+    """Удаляет картинку и её миниатюры, если она больше не нужна постам.
+
+    Хранилище картинок раздаёт один файл всем постам с одинаковым
+    содержимым, поэтому ссылки считаются запросом к Post в основной
+    базе. Файл, который загружали заново после released_at (время
+    отпускания, как у time.time()), мог достаться посту, ещё не
+    сохранённому в базе, и остаётся.
+    """
+    if Post.objects.using(router.db_for_write(Post)).filter(
+        image=name
+    ).exists():
+        return
+    storage = Post.image.field.storage
+    try:
+        if os.path.getmtime(storage.path(name)) > released_at:
+            return
+    except FileNotFoundError:
+        pass
+    delete(ImageFile(name, storage))
@@ -0,0 +1,82 @@
+import os
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+
+class OversizedUpload(UploadedFile):
+    """Заглушка вместо файла, который превысил POST_IMAGE_MAX_BYTES.
+
+    Содержимое не сохраняется, остаётся только размер для сообщения
+    об ошибке в форме.
+    """
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Пропускает к следующим обработчикам не больше POST_IMAGE_MAX_BYTES.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS: пока файл укладывается в лимит,
+    куски уходят дальше в память или во временный файл, после — только
+    считаются, а вместо файла возвращается OversizedUpload.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return OversizedUpload(
+                self.file_name, self.content_type, self.received)
+        return None
+
+
+def image_size(upload):
+    """Размеры картинки по заголовку, без декодирования пикселей."""
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            return image.size
+    finally:
+        upload.seek(0)
+
+
+def normalize_image(upload):
+    """Поворачивает картинку по EXIF, убирает метаданные и уменьшает её.
+
+    Файл без EXIF, который помещается в POST_IMAGE_MAX_SIDE, и анимации
+    возвращаются как есть. Остальное перекодируется во временный файл,
+    который держится в памяти, пока не превысит FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    image = Image.open(upload)
+    if getattr(image, 'is_animated', False) or (
+        'exif' not in image.info and max(image.size) <= max_side
+    ):
+        upload.seek(0)
+        return upload
+    image_format = image.format
+    # JPEG умеет декодироваться сразу в уменьшенном масштабе.
+    image.draft(image.mode, (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    result = SpooledTemporaryFile(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    image.save(result, format=image_format, quality=90)
+    size = result.tell()
+    result.seek(0)
+    return UploadedFile(
+        result, os.path.basename(upload.name), upload.content_type, size)
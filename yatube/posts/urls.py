@@ -15,6 +15,7 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -25,6 +26,17 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/notify/',
+        views.profile_notify,
+        name='profile_notify'
+    ),
+    path(
+        'profile/<str:username>/mute/',
+        views.profile_notify,
+        {'notify': False},
+        name='profile_mute'
+    ),
     path('create/', views.post_create, name='create_post'),
     path('', views.index, name='index'),
 ]
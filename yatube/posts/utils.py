@@ -1,7 +1,219 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values=None):
+    """Упаковывает направление и значения ключа в непрозрачную строку."""
+    if values is not None:
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+    raw = json.dumps([direction, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор, созданный encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(cursor)
+    if values is not None and not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу сортировки вместо OFFSET/LIMIT.
+
+    Страница выбирается условием на последний показанный ключ, поэтому
+    любая страница стоит столько же, сколько первая. Последний ключ в
+    ordering должен быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 transform=None, count_limit=None):
+        self.object_list = object_list.order_by(*ordering)
+        self.per_page = per_page
+        self.keys = [name.lstrip('-') for name in ordering]
+        self.descending = [name.startswith('-') for name in ordering]
+        self.transform = transform
+        self.count_limit = count_limit
+        self.fields = [self._field(key) for key in self.keys]
+
+    def _field(self, key):
+        """Поле ключа: поле модели или output_field аннотации."""
+        opts = self.object_list.model._meta
+        if key == 'pk':
+            return opts.pk
+        annotations = self.object_list.query.annotations
+        if key in annotations:
+            return annotations[key].output_field
+        return opts.get_field(key)
+
+    @cached_property
+    def _bounded_count(self):
+        queryset = self.object_list.order_by()
+        if self.count_limit is not None:
+            queryset = queryset[:self.count_limit + 1]
+        return queryset.count()
+
+    @property
+    def count(self):
+        """Число объектов, но не больше count_limit."""
+        if self.count_limit is None:
+            return self._bounded_count
+        return min(self._bounded_count, self.count_limit)
+
+    @property
+    def count_is_exact(self):
+        return (
+            self.count_limit is None
+            or self._bounded_count <= self.count_limit
+        )
+
+    @property
+    def last_cursor(self):
+        return encode_cursor(PREVIOUS)
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; битый курсор даёт первую."""
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = decode_cursor(cursor)
+                if values is not None:
+                    values = self._to_python(values)
+            except (InvalidCursor, ValidationError):
+                cursor, direction, values = None, NEXT, None
+        return KeysetPage(self, cursor, direction, values)
+
+    def key_values(self, obj):
+        return [getattr(obj, key) for key in self.keys]
+
+    def _to_python(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        return [
+            field.to_python(value)
+            for field, value in zip(self.fields, values)
+        ]
+
+    def _seek(self, values, backwards):
+        """Условие «строго после ключа values» в порядке обхода."""
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            lookup = 'gt' if self.descending[i] == backwards else 'lt'
+            step = Q(**{f'{key}__{lookup}': values[i]})
+            for prev_key, prev_value in zip(self.keys[:i], values[:i]):
+                step &= Q(**{prev_key: prev_value})
+            condition |= step
+        return condition
+
+
+class KeysetPage:
+    def __init__(self, paginator, cursor, direction, values):
+        self.paginator = paginator
+        self.cursor = cursor or ''
+        self.direction = direction
+        self.values = values
+        self._has_more = False
+
+    @property
+    def backwards(self):
+        return self.direction == PREVIOUS
+
+    @property
+    def queryset(self):
+        """Запрос страницы: на одну строку больше, чтобы узнать о следующей."""
+        paginator = self.paginator
+        queryset = paginator.object_list
+        if self.values is not None:
+            queryset = queryset.filter(
+                paginator._seek(self.values, self.backwards)
+            )
+        if self.backwards:
+            queryset = queryset.reverse()
+        return queryset[:paginator.per_page + 1]
+
+    @cached_property
+    def rows(self):
+        per_page = self.paginator.per_page
+        rows = list(self.queryset)
+        self._has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if self.backwards:
+            rows.reverse()
+        return rows
+
+    @cached_property
+    def object_list(self):
+        if self.paginator.transform is None:
+            return self.rows
+        return [self.paginator.transform(row) for row in self.rows]
+
+    def __repr__(self):
+        return f'<KeysetPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        if self.backwards:
+            return self.values is not None and bool(self.rows)
+        return bool(self.rows) and self._has_more
+
+    def has_previous(self):
+        if self.backwards:
+            return bool(self.rows) and self._has_more
+        return self.values is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(NEXT, self.paginator.key_values(self.rows[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(
+            PREVIOUS, self.paginator.key_values(self.rows[0])
+        )
 
 
-def pagination(request, post_list):
-    paginator = Paginator(post_list, settings.PAGINATOR_POSTS_PER_PAGE)
-    return paginator.get_page(request.GET.get('page'))
+def pagination(request, object_list, per_page=None, **kwargs):
+    kwargs.setdefault('count_limit', settings.PAGINATOR_COUNT_LIMIT)
+    paginator = KeysetPaginator(
+        object_list,
+        per_page or settings.PAGINATOR_POSTS_PER_PAGE,
+        **kwargs
+    )
+    return paginator.get_page(request.GET.get('cursor'))
@@ -1,64 +1,173 @@
+from operator import attrgetter
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render, get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from core.cache import changed_at
+from core.conditional import conditional_response
 
+from . import cache, feed, search
+from .counters import get_counters
 from .forms import CommentForm, PostForm
 from .models import Group, Post, User, Follow
 from .utils import pagination
 
 
+def page_response(request, validators, last_modified, build):
+    """Страница из build() или 304, см. core.conditional.
+
+    Проверки не ходят в базу: ETag и Last-Modified берутся из поколений
+    кэша и уже загруженных объектов. Last-Modified есть только у страниц,
+    поколение которых меняет любая их правка, остальным хватает ETag.
+    Страницы анонимов одинаковы для всех, поэтому общий кэш может
+    хранить их PAGE_S_MAXAGE секунд; страницы пользователя — только его
+    браузер. ETag слабый: CSRF-токен в формах маскируется заново при
+    каждой отрисовке.
+    """
+    user = request.user
+    if user.is_authenticated:
+        validators = (*validators, user.pk)
+    response = conditional_response(
+        request, validators, last_modified, build, weak=True)
+    patch_vary_headers(response, ('Cookie',))
+    if user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=0,
+            s_maxage=settings.PAGE_S_MAXAGE.get(
+                request.resolver_match.view_name, 0),
+        )
+    return response
+
+
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.select_related('author', 'group').all()
-    context = {
-        'page_obj': pagination(request, posts),
-    }
-    return render(request, template, context)
+    generation = cache.index_generation()
+
+    def build():
+        context = {
+            'page_obj': pagination(request, posts),
+            'generation': generation,
+            'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        }
+        return render(request, template, context)
+
+    return page_response(
+        request, (generation,), lambda: changed_at(generation), build)
 
 
 def group_posts(request, slug=None):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.all()
+    posts = group.group_posts.select_related('author', 'group')
+    generation = cache.group_generation(group)
+
+    def build():
+        context = {
+            'group': group,
+            'page_obj': pagination(request, posts),
+            'generation': generation,
+            'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        }
+        return render(request, template, context)
+
+    return page_response(
+        request, (generation,), lambda: changed_at(generation), build)
+
+
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+
+    def highlighted(entry):
+        entry.post.highlighted = search.highlight(entry.post.text, query)
+        return entry.post
+
+    page_obj = pagination(
+        request,
+        search.search(query).select_related('post__author', 'post__group'),
+        ordering=('score', 'post_id'),
+        transform=highlighted,
+    )
     context = {
-        'group': group,
-        'page_obj': pagination(request, posts),
+        'query': query,
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    if (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author)
-    ):
-        following = True
-    else:
-        following = False
-    posts = author.posts.all()
-    context = {
-        'author': author,
-        'following': following,
-        'page_obj': pagination(request, posts),
-    }
-    return render(request, template, context)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    posts = author.posts.select_related('author', 'group')
+    counters = get_counters(author)
+    generation = cache.author_generation(author)
+    validators = [
+        generation, counters.posts, counters.followers, counters.following,
+    ]
+    if request.user.is_authenticated:
+        # Подписка и отписка меняют поколение ленты читателя.
+        validators.append(cache.feed_generation(request.user))
+
+    def build():
+        follow = None
+        if request.user.is_authenticated:
+            follow = Follow.objects.filter(
+                user=request.user, author=author).first()
+        context = {
+            'author': author,
+            'counters': counters,
+            'following': follow is not None,
+            'notify': follow is not None and follow.notify,
+            'page_obj': pagination(request, posts),
+            'generation': generation,
+            'cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        }
+        return render(request, template, context)
+
+    return page_response(request, validators, lambda: None, build)
 
 
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    author = get_object_or_404(User, username=post.author)
-    counter = author.posts.all().count()
-    comments = post.comments.all()
-    form = CommentForm(request.POST or None)
-    context = {
-        'post': post,
-        'counter': counter,
-        'form': form,
-        'comments': comments,
-    }
-    return render(request, template, context)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        id=post_id
+    )
+    counter = get_counters(post.author).posts
+
+    def build():
+        comments = pagination(
+            request,
+            post.comments.select_related('author'),
+            per_page=settings.PAGINATOR_COMMENTS_PER_PAGE,
+            ordering=('created', 'pk'),
+        )
+        form = CommentForm(request.POST or None)
+        context = {
+            'post': post,
+            'counter': counter,
+            'form': form,
+            'comments': comments,
+        }
+        return render(request, template, context)
+
+    # Счётчик постов автора не входит в поколение поста.
+    return page_response(
+        request,
+        (cache.post_generation(post), counter),
+        lambda: None,
+        build,
+    )
 
 
 @login_required
@@ -92,7 +201,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        post = form.save()
+        # Только поля формы: comments_count мог измениться после загрузки.
+        post = form.save(commit=False)
+        post.save(update_fields=form.changed_data)
         return redirect('posts:post_detail', post.pk)
     context = {
         'post_id': post_id,
@@ -117,12 +228,16 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    list_posts = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related("author", "group")
-    page_obj = pagination(request, list_posts)
+    page_obj = pagination(
+        request,
+        feed.entries_for(request.user),
+        ordering=('-pub_date', '-post_id'),
+        transform=attrgetter('post'),
+    )
     context = {
-        "page_obj": page_obj
+        "page_obj": page_obj,
+        "generation": cache.feed_generation(request.user),
+        "cache_timeout": settings.FOLLOW_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
@@ -151,3 +266,15 @@ def profile_unfollow(request, username):
     if old.exists():
         old.delete()
     return redirect("posts:profile", username=author)
+
+
+@login_required
+def profile_notify(request, username, notify=True):
+    follow = Follow.objects.filter(
+        user=request.user,
+        author__username=username
+    ).first()
+    if follow is not None and follow.notify != notify:
+        follow.notify = notify
+        follow.save(update_fields=['notify'])
+    return redirect("posts:profile", username=username)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,6 +38,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'core.apps.CoreConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
@@ -50,6 +52,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,7 +70,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,11 +91,63 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
+DB_POSTGRESQL = DB_ENGINE == 'django.db.backends.postgresql'
+
+if DB_POSTGRESQL:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Постоянные соединения: одно на поток воркера.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+            # Пул соединений держит pgbouncer; в режиме pool_mode=transaction
+            # серверные курсоры использовать нельзя.
+            'DISABLE_SERVER_SIDE_CURSORS': (
+                os.getenv('DB_PGBOUNCER', '') == '1'
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        }
     }
+
+# Реплики для чтения: DB_REPLICAS — пути к файлам SQLite или хосты
+# PostgreSQL через запятую. Маршрутизация — core.routers.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        **({'HOST': replica} if DB_POSTGRESQL else {'NAME': replica}),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# После записи пользователь столько секунд читает из основной базы.
+REPLICA_PIN_COOKIE = 'read_primary'
+REPLICA_PIN_SECONDS = 10
+
+# Применяются к каждому новому соединению с SQLite (core.signals):
+# WAL не блокирует чтение во время записи, а busy_timeout заставляет
+# писателей ждать блокировку вместо ошибки «database is locked».
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
 }
 
 
@@ -139,16 +197,136 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Адрес сайта для ссылок в письмах, которые уходят не из запроса.
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+# Сводки новых постов (posts.notifications, `manage.py send_digests`):
+# получатель получает не больше одного письма за NOTIFY_DIGEST_WINDOW
+# секунд, письма уходят пачками по NOTIFY_BATCH_SIZE через одно соединение.
+NOTIFY_DIGEST_WINDOW = 60 * 60
+NOTIFY_BATCH_SIZE = 500
 
 PAGINATOR_POSTS_PER_PAGE = 10
+PAGINATOR_COUNT_LIMIT = 1000
+PAGINATOR_COMMENTS_PER_PAGE = 50
+
+# Лента подписок: посты авторов, у которых подписчиков больше
+# FEED_FANOUT_LIMIT, не раскладываются при записи, а забираются при чтении.
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 100
+FOLLOW_CACHE_TIMEOUT = 60 * 60
+
+# Фрагменты списков сбрасываются поколениями core.cache, поэтому их можно
+# держать в кэше часами.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Загрузка картинок: файл больше POST_IMAGE_MAX_BYTES не сохраняется,
+# картинка больше POST_IMAGE_MAX_PIXELS отклоняется по заголовку, а
+# стороны больше POST_IMAGE_MAX_SIDE уменьшаются при загрузке.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 2560
+# Картинку без постов удаляет задача через столько секунд после того, как
+# её отпустил последний пост.
+POST_IMAGE_RELEASE_DELAY = 10 * 60
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Миниатюры картинок постов строятся задачей core.tasks после сохранения
+# поста, шаблоны только ищут готовые.
+POST_THUMBNAIL_SIZES = {
+    'list': {
+        'geometry': '900x450',
+        'options': {'crop': 'center', 'upscale': True},
+        'widths': (300, 600, 900),
+        'sizes': '(min-width: 768px) 25vw, 100vw',
+    },
+    'detail': {
+        'geometry': '960x200',
+        'options': {'crop': 'center', 'upscale': True},
+        'widths': (480, 960),
+        'sizes': '(min-width: 768px) 75vw, 100vw',
+    },
+}
+# Каждая ширина строится во всех форматах, которые умеет сохранять Pillow
+# (AVIF — с плагином pillow-avif-plugin). Последний формат — запасной для
+# браузеров без <picture>.
+POST_THUMBNAIL_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+# Метаданные миниатюр: LRU процесса перед общим кэшем и базой.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_LRU_SIZE = 10000
+# Сколько помнить, что миниатюры ещё нет: её достраивает воркер.
+THUMBNAIL_MISSING_CACHE_TIMEOUT = 60
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Картинки постов лежат под хешем содержимого, миниатюры — под хешем
+# картинки и параметров, поэтому файл по адресу никогда не меняется.
+# Django отдаёт медиафайлы только при DEBUG (core.views.serve_media), и
+# настройка действует лишь там; в бою тот же заголовок ставит веб-сервер,
+# см. README.
+MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Целые страницы постов для анонимов (posts.middleware). Запись постов и
+# комментариев сбрасывает их сразу, а счётчики на чужих страницах
+# (например, число постов автора на странице другого его поста) могут
+# отставать не дольше этого времени. 0 выключает кэш страниц.
+FULL_PAGE_CACHE_TIMEOUT = 10 * 60
+
+# Сколько секунд общий кэш (обратный прокси) может отдавать анонимам
+# страницу без перепроверки. Браузеры перепроверяют её каждый раз по
+# ETag и Last-Modified, страницы пользователей в общий кэш не попадают.
+PAGE_S_MAXAGE = {
+    'posts:index': 60,
+    'posts:group_list': 60,
+    'posts:profile': 60,
+    'posts:post_detail': 30,
+}
 
+# Метрики страниц (core.metrics): шаблоны и кэш подключены через бэкенды
+# с замерами, /metrics отдаётся по METRICS_TOKEN. METRICS_ALLOWED_IPS
+# (адреса через запятую) открывает его без токена тем, кто ходит в
+# приложение напрямую, а не через прокси.
+METRICS_ALLOWED_IPS = tuple(
+    filter(None, os.getenv('METRICS_ALLOWED_IPS', '').split(',')))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_SERVER_TIMING = True
+
+# Профили медленных запросов (core.profiling). По умолчанию профилируются
+# только запросы с заголовком X-Profile из `manage.py profiles --token`.
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_THRESHOLD_MS = float(os.getenv('PROFILE_THRESHOLD_MS', 500))
+PROFILE_NAMESPACES = ('posts',)
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_MAX_FILES = 200
+PROFILE_TOKEN_MAX_AGE = 24 * 60 * 60
+
+# Очередь фоновых задач (core.tasks): раскладка постов по лентам, поиск,
+# миниатюры и сброс лент подписчиков. Их выполняет `manage.py run_tasks`,
+# которому нужен общий с веб-процессами кэш (см. CACHES). С TASKS_EAGER=1
+# они выполняются после коммита в том же процессе; это режим тестов.
+TESTING = sys.argv[1:2] == ['test']
+TASKS_EAGER = os.getenv('TASKS_EAGER', '1' if TESTING else '0') == '1'
+TASKS_WORKERS = 2
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_MAX_RETRY_DELAY = 60 * 60
+TASKS_LOCK_TIMEOUT = 10 * 60
+
+# Воркер run_tasks сбрасывает поколения и пишет миниатюры в кэш, поэтому
+# без TASKS_EAGER кэш должен быть общим с веб-процессами, например
+# CACHE_BACKEND=core.metrics.MemcachedMetricsCache и
+# CACHE_LOCATION=127.0.0.1:11211. Кэш в памяти процесса run_tasks не примет.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'core.metrics.LocMemMetricsCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
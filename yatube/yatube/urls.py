@@ -18,6 +18,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics, serve_media
+
 handler403 = 'core.views.permission_denied'
 handler403csrf = 'core.views.csrf_failure'
 handler404 = 'core.views.page_not_found'
@@ -31,10 +33,16 @@ urlpatterns = [
 
     path('about/', include('about.urls', namespace='about')),
 
+    path('metrics', metrics, name='metrics'),
+
+    path('api/v1/', include('api.urls', namespace='api')),
+
     path('', include('posts.urls', namespace='posts')),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL,
+        view=serve_media,
+        document_root=settings.MEDIA_ROOT,
     )